@@ -0,0 +1,95 @@
+import re
+from urllib.parse import urlsplit
+
+# hosts-file addresses that mean "blackhole this host"
+SINK_ADDRESSES = {"0.0.0.0", "127.0.0.1", "::", "::1"}
+HOST_RE = re.compile(r"^[a-z0-9_-]+(\.[a-z0-9_-]+)+$")
+
+
+def parse_host_rule(line):
+    """Hostname blocked by one blocklist line, or None if the line isn't a host rule.
+
+    Understands hosts files ("0.0.0.0 ads.example.com"), plain domain lists
+    ("ads.example.com") and EasyList domain anchors ("||ads.example.com^",
+    options after "$" are ignored). Comments, path rules and cosmetic rules are skipped.
+    """
+    line = line.strip().lower()
+    if not line or line[0] in "#![" or "##" in line or "#@#" in line or line.startswith("@@"):
+        return None
+    if line.startswith("||"):
+        host, sep, rest = line[2:].partition("^")
+        if not sep or (rest and not rest.startswith("$")):
+            return None  # "||host/path" or similar: not a whole-host rule
+    else:
+        parts = line.split("#", 1)[0].split()
+        if len(parts) == 2 and parts[0] in SINK_ADDRESSES:
+            host = parts[1]
+        elif len(parts) == 1:
+            host = parts[0]
+        else:
+            return None
+    if host in ("localhost", "localhost.localdomain", "local", "broadcasthost"):
+        return None
+    return host if HOST_RE.match(host) else None
+
+
+class AdBlocker:
+    """Precompiled ad / tracker matcher for the Playwright route handler.
+
+    URL keywords are folded into a single compiled regex, and blocked hosts are
+    kept in a set checked by hostname suffix. The cost per request depends on
+    the number of labels in the hostname, not on how many rules are loaded.
+    """
+
+    def __init__(self, keywords=(), hosts=()):
+        self.keywords = list(keywords)
+        self.hosts = {h.lower() for h in hosts}
+        self._keyword_re = None
+        self._compile()
+
+    def _compile(self):
+        if self.keywords:
+            alternation = "|".join(re.escape(k.lower()) for k in dict.fromkeys(self.keywords))
+            self._keyword_re = re.compile(alternation)
+        else:
+            self._keyword_re = None
+
+    def load_hostlist(self, path):
+        """Add every host rule from an EasyList / hosts-file style list; returns how many were added"""
+        before = len(self.hosts)
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                host = parse_host_rule(line)
+                if host:
+                    self.hosts.add(host)
+        return len(self.hosts) - before
+
+    def host_blocked(self, host):
+        """True if the host or any parent domain is in the blocklist"""
+        if not self.hosts or not host:
+            return False
+        host = host.lower().rstrip(".")
+        while True:
+            if host in self.hosts:
+                return True
+            dot = host.find(".")
+            if dot < 0:
+                return False
+            host = host[dot + 1:]
+
+    def keyword_blocked(self, url):
+        return bool(self._keyword_re and self._keyword_re.search(url.lower()))
+
+    def is_blocked(self, url, host=None):
+        """True if the URL matches a keyword or its host is blocklisted.
+
+        Pass `host` when the caller has already parsed it.
+        """
+        if self.keyword_blocked(url):
+            return True
+        if host is None:
+            try:
+                host = urlsplit(url).hostname or ""
+            except ValueError:
+                host = ""
+        return self.host_blocked(host)
@@ -0,0 +1,85 @@
+"""Benchmark for the Playwright route handler's ad-block decision.
+
+Replays a request log through the old linear matcher (keyword `any()` scan plus
+a linear scan over blocked hosts) and through adblock.AdBlocker, with
+blocklists of increasing size. Both must make the same decision for every
+request; exits non-zero if they ever disagree.
+
+    python benchmarks/bench_adblock.py [--log requests.tsv] [--blocklist easylist.txt]
+
+The log has one "resource_type<TAB>page_url<TAB>request_url" line per request.
+Without --log a synthetic ad-heavy log from fixtures.request_log() is used.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adblock import AdBlocker, parse_host_rule  # noqa: E402
+from main import AD_KEYWORDS, domain_of  # noqa: E402
+from fixtures import AD_HOSTS, request_log  # noqa: E402
+
+
+def linear_blocked(url, host, keywords, hosts):
+    lu = url.lower()
+    if any(k in lu for k in keywords):
+        return True
+    return any(host == h or host.endswith("." + h) for h in hosts)
+
+
+def synthetic_hosts(n, seed=0):
+    rng = random.Random(seed)
+    hosts = list(AD_HOSTS)
+    while len(hosts) < n:
+        hosts.append(f"{rng.choice(['ads', 'track', 'px', 'cdn', 'sync'])}{rng.randrange(10**6)}.adnet{rng.randrange(5000)}.com")
+    return hosts[:n]
+
+
+def time_per_request(fn, requests, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decisions = [fn(url, host) for url, host in requests]
+    return (time.perf_counter() - start) / (repeat * len(requests)) * 1e6, decisions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--log", help="recorded request log (TSV); defaults to a synthetic one")
+    ap.add_argument("--blocklist", help="also benchmark this EasyList / hosts-file list")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.log:
+        with open(args.log, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    else:
+        lines = request_log().splitlines()
+    # (url, host) pairs; the route handler parses the host once per request either way
+    requests = [(url, domain_of(url)) for _, _, url in (l.split("\t") for l in lines if l)]
+    print(f"{len(requests)} requests")
+
+    lists = {f"{n} synthetic hosts": synthetic_hosts(n) for n in (0, 1_000, 10_000, 50_000)}
+    if args.blocklist:
+        with open(args.blocklist, encoding="utf-8", errors="ignore") as f:
+            lists[os.path.basename(args.blocklist)] = [h for h in map(parse_host_rule, f) if h]
+
+    ok = True
+    for name, hosts in lists.items():
+        blocker = AdBlocker(AD_KEYWORDS, hosts)
+        # the linear scan gets slow with big lists: replay fewer requests for it
+        sample = requests if len(hosts) <= 1_000 else requests[:max(200, len(requests) // max(1, len(hosts) // 1_000))]
+        old_us, old = time_per_request(lambda u, h: linear_blocked(u, h, AD_KEYWORDS, hosts), sample, args.repeat)
+        new_us, new = time_per_request(blocker.is_blocked, sample, args.repeat)
+        same = old == new
+        ok &= same
+        print(f"  {name:<22} linear {old_us:9.2f} us/req   AdBlocker {new_us:6.2f} us/req   "
+              f"x{old_us / new_us:7.1f}   blocked {sum(new)}/{len(sample)}  {'same' if same else 'MISMATCH'}")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Micro-benchmark for listing-page parsing (PastPapersWikiScraper.extract_listing).
+
+Times every parser backend on each saved fixture in benchmarks/fixtures/ and
+checks that each backend extracts exactly the same papers and last page as the
+plain html.parser baseline. Exits non-zero on a mismatch.
+
+    python benchmarks/bench_extract.py [--repeat N]
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import PastPapersWikiScraper  # noqa: E402
+from fixtures import FIXTURE_DIR  # noqa: E402
+
+CATEGORY_URL = "https://pastpapers.wiki/category/physics/"
+
+BACKENDS = {
+    # name: (parser, strain_listings)
+    "html.parser": ("html.parser", False),
+    "html.parser+strainer": ("html.parser", True),
+    "lxml": ("lxml", False),
+    "lxml+strainer": ("lxml", True),
+    "lxml-native": ("lxml-native", False),
+}
+
+
+def run_once(scraper, html):
+    with contextlib.redirect_stdout(io.StringIO()):  # extraction prints every paper
+        return scraper.extract_listing(html, CATEGORY_URL)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    fixtures = sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+    if not fixtures:
+        sys.exit(f"No fixtures in {FIXTURE_DIR}; run benchmarks/fixtures.py first.")
+
+    ok = True
+    for path in fixtures:
+        with open(path, "rb") as f:
+            html = f.read()
+        print(f"\n{os.path.basename(path)} ({len(html) // 1024} KiB, {args.repeat} runs)")
+        baseline = None
+        base_time = None
+        for name, (parser, strain) in BACKENDS.items():
+            try:
+                scraper = PastPapersWikiScraper(CATEGORY_URL, parser=parser, strain_listings=strain)
+            except ValueError as e:  # lxml not installed
+                print(f"  {name:<22} skipped ({e})")
+                continue
+            out = run_once(scraper, html)
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                run_once(scraper, html)
+            per_run = (time.perf_counter() - start) / args.repeat * 1000
+
+            if baseline is None:
+                baseline, base_time = out, per_run
+            same = out == baseline
+            ok &= same
+            print(f"  {name:<22} {per_run:8.2f} ms/page  x{base_time / per_run:5.2f}  "
+                  f"{len(out[0])} papers  {'identical' if same else 'MISMATCH'}")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
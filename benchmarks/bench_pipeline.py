@@ -0,0 +1,198 @@
+"""Scraper and downloader throughput against the local stand-in server.
+
+Starts benchmarks/standin.py in-process and, for each concurrency level,
+crawls every page of a stand-in category with PastPapersWikiScraper (and
+AsyncPastPapersWikiScraper, if httpx is installed) and downloads a batch of stand-in posts with main.download_all (fresh save folder
+and manifest each time). Reports throughput and p50/p95 latency per level.
+
+    python benchmarks/bench_pipeline.py [--concurrency 1,2,4,8] [--posts 24] [--latency 0.05]
+    python benchmarks/bench_pipeline.py --save baseline.json
+    python benchmarks/bench_pipeline.py --compare baseline.json   # exits 1 on a throughput regression
+
+Without Chromium installed, use --layouts link to benchmark the HTTP path only.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as downloader  # noqa: E402
+from scrape import PastPapersWikiScraper, AsyncPastPapersWikiScraper, httpx  # noqa: E402
+from timing import percentile, summarize, print_summary  # noqa: E402
+from standin import LAYOUTS, StandIn  # noqa: E402
+
+MIB = 1024 * 1024
+
+
+def quiet(enabled):
+    return contextlib.redirect_stdout(io.StringIO()) if enabled else contextlib.nullcontext()
+
+
+def bench_scraper(standin, concurrency, verbose=False):
+    scraper = PastPapersWikiScraper(standin.category_url(), max_workers=concurrency)
+    latencies = []
+    scraper.session.hooks["response"].append(lambda r, *a, **k: latencies.append(r.elapsed.total_seconds()))
+    start = time.perf_counter()
+    with quiet(not verbose):
+        papers = list(scraper.iter_papers())
+    wall = time.perf_counter() - start
+    return {
+        "pages": len(latencies), "papers": len(papers), "wall_s": wall,
+        "pages_per_s": len(latencies) / wall,
+        "p50_s": percentile(latencies, 50), "p95_s": percentile(latencies, 95),
+    }
+
+
+def bench_async_scraper(standin, concurrency, verbose=False):
+    latencies = []
+
+    async def log_latency(response):
+        await response.aread()
+        latencies.append(response.elapsed.total_seconds())
+
+    async def crawl():
+        async with AsyncPastPapersWikiScraper(standin.category_url(), max_concurrency=concurrency) as scraper:
+            scraper.client.event_hooks["response"].append(log_latency)
+            return await scraper.scrape_all_papers()
+
+    start = time.perf_counter()
+    with quiet(not verbose):
+        papers = asyncio.run(crawl())
+    wall = time.perf_counter() - start
+    return {
+        "pages": len(latencies), "papers": len(papers), "wall_s": wall,
+        "pages_per_s": len(latencies) / wall,
+        "p50_s": percentile(latencies, 50), "p95_s": percentile(latencies, 95),
+    }
+
+
+def bench_downloader(standin, urls, concurrency, verbose=False, profile_dir=None):
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as tmp:
+        downloader.SAVE_DIR = tmp
+        downloader.FAILURE_REPORT = os.path.join(tmp, "failures.json")
+        timing_log = os.path.join(tmp, "timings.jsonl")
+        start = time.perf_counter()
+        with quiet(not verbose):
+            results = asyncio.run(downloader.download_all(
+                urls, concurrency=concurrency, per_host=concurrency,
+                manifest_path=os.path.join(tmp, "manifest.sqlite3"), timing_log=timing_log,
+                warm_start=profile_dir is not None, profile_dir=profile_dir))
+        wall = time.perf_counter() - start
+        with open(timing_log, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+
+    summary = summarize(records, wall)
+    if verbose:
+        print_summary(summary)
+    # latency of a URL = all its attempts, in every stage
+    per_url = {}
+    for rec in records:
+        per_url[rec["url"]] = per_url.get(rec["url"], 0.0) + rec["total_s"]
+    saved = sum(1 for r in results if r["saved"])
+    return {
+        "urls": len(urls), "saved": saved, "wall_s": wall,
+        "urls_per_s": saved / wall, "mib_per_s": summary["bytes"] / MIB / wall,
+        "p50_s": percentile(list(per_url.values()), 50), "p95_s": percentile(list(per_url.values()), 95),
+        "saved_by": summary["won_by"],
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Throughput drops of more than `tolerance` (a fraction) against a saved run"""
+    regressions = []
+    for bench, key in (("scraper", "pages_per_s"), ("async_scraper", "pages_per_s"), ("downloader", "urls_per_s")):
+        for level, row in current[bench].items():
+            old = baseline.get(bench, {}).get(level)
+            if not old or not old[key]:
+                continue
+            change = row[key] / old[key] - 1
+            if change < -tolerance:
+                regressions.append(f"{bench} @ concurrency {level}: {key} {old[key]:.2f} → {row[key]:.2f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--concurrency", default="1,2,4,8", help="comma-separated levels to sweep")
+    ap.add_argument("--posts", type=int, default=24, help="posts to download per level")
+    ap.add_argument("--pages", type=int, default=10, help="listing pages in the stand-in category")
+    ap.add_argument("--layouts", default=",".join(LAYOUTS))
+    ap.add_argument("--latency", type=float, default=0.05, help="seconds added to every page / PDF response")
+    ap.add_argument("--jitter", type=float, default=0.05)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--error-status", type=int, default=503)
+    ap.add_argument("--ads", type=int, default=20, help="ad requests per post page")
+    ap.add_argument("--pdf-size", type=int, default=512 * 1024)
+    ap.add_argument("--polite-delay", type=float, default=0.0,
+                    help="starting per-host gap for the downloader (main.POLITE_DELAY; 0 = no pacing)")
+    ap.add_argument("--warm-start", action="store_true",
+                    help="downloader runs start Chromium early on one profile shared across the sweep")
+    ap.add_argument("--skip", choices=("scraper", "downloader"), action="append", default=[])
+    ap.add_argument("--save", help="write the results to this JSON file")
+    ap.add_argument("--compare", help="fail if throughput dropped against this saved JSON file")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop for --compare")
+    ap.add_argument("--verbose", action="store_true", help="show scraper/downloader output and run reports")
+    args = ap.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    downloader.POLITE_DELAY = args.polite_delay
+    standin = StandIn(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      error_status=args.error_status, ad_requests=args.ads, pdf_size=args.pdf_size,
+                      layouts=args.layouts.split(","), n_pages=args.pages)
+    results = {"config": vars(args), "scraper": {}, "async_scraper": {}, "downloader": {}}
+
+    with standin:
+        print(f"Stand-in at {standin.base_url}: latency {args.latency}s ±{args.jitter}s, "
+              f"errors {args.error_rate:.0%}, {args.ads} ads/post, {args.pdf_size // 1024} KiB PDFs, "
+              f"layouts {args.layouts}")
+        if "scraper" not in args.skip:
+            print(f"\nScraper: {args.pages} listing pages")
+            print(f"  {'client':<8} {'conc':>4} {'pages':>6} {'papers':>7} {'wall':>8} {'pages/s':>8} {'p50':>8} {'p95':>8}")
+            benches = [("scraper", "requests", bench_scraper)]
+            if httpx is not None:
+                benches.append(("async_scraper", "httpx", bench_async_scraper))
+            for key, client, bench in benches:
+                for c in levels:
+                    row = bench(standin, c, args.verbose)
+                    results[key][str(c)] = row
+                    print(f"  {client:<8} {c:>4} {row['pages']:>6} {row['papers']:>7} {row['wall_s']:>7.2f}s "
+                          f"{row['pages_per_s']:>8.1f} {row['p50_s']:>7.3f}s {row['p95_s']:>7.3f}s")
+
+        if "downloader" not in args.skip:
+            urls = standin.post_urls(args.posts)
+            print(f"\nDownloader: {args.posts} posts")
+            print(f"  {'conc':>4} {'saved':>7} {'wall':>8} {'urls/s':>7} {'MiB/s':>7} {'p50':>8} {'p95':>8}  saved by")
+            profile = tempfile.TemporaryDirectory(prefix="bench_profile_") if args.warm_start else None
+            for c in levels:
+                row = bench_downloader(standin, urls, c, args.verbose, profile and profile.name)
+                results["downloader"][str(c)] = row
+                by = ", ".join(f"{k} {v}" for k, v in sorted(row["saved_by"].items()))
+                print(f"  {c:>4} {row['saved']:>3}/{row['urls']:<3} {row['wall_s']:>7.2f}s {row['urls_per_s']:>7.2f} "
+                      f"{row['mib_per_s']:>7.2f} {row['p50_s']:>7.2f}s {row['p95_s']:>7.2f}s  {by}")
+            if profile:
+                profile.cleanup()
+        print(f"\nServer hits: {standin.hits}, injected errors: {standin.errors}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION:", line)
+        if regressions:
+            sys.exit(1)
+        print(f"No throughput drop over {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
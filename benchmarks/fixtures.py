@@ -0,0 +1,180 @@
+"""Synthetic pastpapers.wiki pages (JNews theme markup) for offline benchmarks.
+
+Run this file to (re)write the saved fixtures in benchmarks/fixtures/.
+Real pages saved from a browser can be dropped into that folder as well.
+"""
+import os
+import random
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+SCHOOLS = [
+    "Royal College", "Ananda College", "Visakha Vidyalaya", "Thurstan College", "Mahanama College",
+    "Devi Balika Vidyalaya", "Dharmapala Vidyalaya", "Ferguson High School", "Sivali Central College",
+    "Taxila Central College", "North Western Province", "North Central Province", "Southern Province",
+]
+TERMS = ["1st Term Test", "2nd Term Test", "3rd Term Test"]
+KINDS = ["Paper", "Marking Scheme"]
+MEDIUMS = ["", " Tamil Medium", " English Medium"]
+
+
+def slugify(text):
+    return "-".join(text.lower().replace("–", "").split())
+
+
+def paper_title(rng, subject, grade):
+    year = rng.choice(range(2015, 2025))
+    title = f"{rng.choice(SCHOOLS)} {subject} {rng.choice(TERMS)} {rng.choice(KINDS)} {year} – Grade {grade}"
+    return title + rng.choice(MEDIUMS)
+
+
+def post_card(host, title, rng, size="jeg_pl_md_2"):
+    slug = slugify(title)
+    return f"""
+<article class="jeg_post {size} format-standard">
+  <div class="jeg_thumb">
+    <a href="{host}/{slug}/"><div class="thumbnail-container animate-lazy size-715">
+      <img width="350" height="250" src="data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
+           class="attachment-jnews-350x250 size-jnews-350x250 lazyload wp-post-image" alt="{title}"
+           data-src="{host}/wp-content/uploads/{rng.randrange(2019, 2025)}/0{rng.randrange(1, 9)}/{slug}-350x250.jpg"
+           data-sizes="auto" data-expand="700" /></div></a>
+    <div class="jeg_post_category"><span><a href="{host}/category/physics/" class="category-physics">Physics</a></span></div>
+  </div>
+  <div class="jeg_postblock_content">
+    <h3 class="jeg_post_title"><a href="{host}/{slug}/">{title}</a></h3>
+    <div class="jeg_post_meta">
+      <div class="jeg_meta_author"><span class="by">by</span> <a href="{host}/author/admin/">Past Papers WiKi</a></div>
+      <div class="jeg_meta_date"><a href="{host}/{slug}/"><i class="fa fa-clock-o"></i> March {rng.randrange(1, 28)}, 2024</a></div>
+    </div>
+    <div class="jeg_post_excerpt">
+      <p>{title}. <strong>Download</strong> the PDF<!-- ad slot --> and practise with the marking scheme &amp; answers for better results.</p>
+      <a href="{host}/{slug}/" class="jeg_readmore">Read more</a>
+    </div>
+  </div>
+</article>"""
+
+
+def category_page(category="physics", page=1, n_pages=40, per_page=12, sidebar=10,
+                  host="https://pastpapers.wiki", subject="Physics", grade=13, seed=None, meta_charset=True):
+    """A category listing page: noisy head/nav/footer, `per_page` post cards, a
+    sidebar block of popular posts and JNews pagination. Without `meta_charset`
+    the page doesn't declare its (UTF-8) encoding."""
+    rng = random.Random(seed if seed is not None else f"{category}-{page}")
+    base = f"{host}/category/{category}/"
+
+    head = "\n".join(
+        f'<link rel="stylesheet" id="style-{k}-css" href="{host}/wp-content/plugins/p{k}/style.css?ver=1.{k}" media="all" />'
+        for k in range(25)
+    ) + "\n".join(
+        f'<script type="text/javascript" src="{host}/wp-includes/js/s{k}.min.js?ver=3.{k}" id="s{k}-js"></script>'
+        for k in range(20)
+    ) + '<script type="text/javascript">' + "var jnewsoption = {" + ",".join(
+        f'"k{k}":"{"x" * 40}"' for k in range(150)
+    ) + "};</script>"
+
+    nav = "".join(
+        f'<li class="menu-item menu-item-type-taxonomy"><a href="{host}/category/subject-{k}/">Subject {k}</a>'
+        f'<ul class="sub-menu">' + "".join(
+            f'<li class="menu-item"><a href="{host}/category/subject-{k}/grade-{g}/">Grade {g}</a></li>' for g in range(6, 14)
+        ) + "</ul></li>"
+        for k in range(30)
+    )
+
+    cards = "".join(post_card(host, paper_title(rng, subject, grade), rng) for _ in range(per_page))
+    side = "".join(post_card(host, paper_title(rng, subject, grade), rng, size="jeg_pl_sm") for _ in range(sidebar))
+
+    pages = sorted({1, 2, 3, page - 1, page, page + 1, n_pages} & set(range(1, n_pages + 1)))
+    pagination = "".join(
+        f'<span class="page_number active">{p}</span>' if p == page else
+        f'<a class="page_number" data-id="{p}" href="{base if p == 1 else f"{base}page/{p}/"}">{p}</a>'
+        for p in pages
+    )
+    if page < n_pages:
+        pagination += f'<a class="page_nav next" data-id="{page + 1}" href="{base}page/{page + 1}/"><span class="navtext">Next</span></a>'
+
+    return f"""<!doctype html>
+<html lang="en-US">
+<head>
+{'<meta charset="UTF-8" />' if meta_charset else ''}
+<title>{subject} Archives - Page {page} of {n_pages} - Past Papers WiKi</title>
+{head}
+</head>
+<body class="archive category category-{category} jeg_toggle_light jnews">
+<div class="jeg_viewport">
+  <div class="jeg_header_wrapper"><div class="jeg_header normal"><div class="jeg_navbar">
+    <ul class="jeg_menu jeg_main_menu">{nav}</ul>
+  </div></div></div>
+  <div class="jeg_main"><div class="jeg_container"><div class="jeg_content"><div class="container">
+    <div class="jeg_cat_header"><h1 class="jeg_cat_title">{subject}</h1></div>
+    <div class="row">
+      <div class="jeg_main_content col-md-8">
+        <div class="jnews_archive_content_wrapper"><div class="jeg_postblock_3 jeg_postblock jeg_col_2o3">
+          <div class="jeg_block_container"><div class="jeg_posts jeg_load_more_flag">{cards}</div></div>
+        </div>
+        <div class="jeg_navigation jeg_pagination jeg_pagenav_1 jeg_aligncenter no_navtext no_pageinfo">
+          <span class="page_info">Page {page} of {n_pages}</span>{pagination}
+        </div></div>
+      </div>
+      <div class="jeg_sidebar col-md-4"><div class="widget widget_jnews_module_block_21">
+        <div class="jeg_block_heading"><h3 class="jeg_block_title"><span>Popular</span></h3></div>
+        <div class="jeg_posts">{side}</div>
+      </div></div>
+    </div>
+  </div></div></div></div>
+  <div class="footer-holder"><footer class="jeg_footer">{"".join(f'<p>Footer link <a href="{host}/p{k}/">p{k}</a></p>' for k in range(40))}</footer></div>
+</div>
+</body>
+</html>"""
+
+
+AD_HOSTS = [
+    "pagead2.googlesyndication.com", "securepubads.g.doubleclick.net", "stats.g.doubleclick.net",
+    "www.google-analytics.com", "connect.facebook.net", "cdn.taboola.com", "widgets.outbrain.com",
+    "static.criteo.net", "sb.scorecardresearch.com", "adservice.google.com", "tpc.googlesyndication.com",
+    "c.amazon-adsystem.com", "ads.pubmatic.com", "ib.adnxs.com", "cdn.onesignal.com", "hb.vntsm.com",
+    "a.pub.network", "cdn.ampproject.org", "platform-api.sharethis.com", "s.gravatar.com",
+]
+CDN_HOSTS = ["fonts.googleapis.com", "fonts.gstatic.com", "cdnjs.cloudflare.com", "i0.wp.com", "ajax.googleapis.com"]
+
+
+def request_log(n_pages=50, host="https://pastpapers.wiki", seed="requests"):
+    """Synthetic request log of an ad-heavy post page load, one
+    "resource_type<TAB>page_url<TAB>request_url" line per request."""
+    rng = random.Random(seed)
+    lines = []
+    for n in range(n_pages):
+        page = f"{host}/{slugify(paper_title(rng, 'Physics', 13))}/?swcfpc=1"
+        reqs = [("document", page)]
+        reqs += [("stylesheet", f"{host}/wp-content/plugins/p{k}/style.css?ver=1.{k}") for k in range(rng.randrange(10, 25))]
+        reqs += [("script", f"{host}/wp-includes/js/s{k}.min.js?ver=3.{k}") for k in range(rng.randrange(10, 20))]
+        reqs += [("image", f"{host}/wp-content/uploads/2024/0{rng.randrange(1, 9)}/img{k}.jpg") for k in range(rng.randrange(5, 30))]
+        for _ in range(rng.randrange(40, 120)):
+            ad = rng.choice(AD_HOSTS)
+            kind = rng.choice(["script", "xhr", "image", "sub_frame", "fetch", "ping"])
+            reqs.append((kind, f"https://{ad}/{rng.choice(['gpt', 'pagead/js', 'tag', 'px', 'collect', 'bid'])}/{rng.randrange(10**6)}?u={n}"))
+        for _ in range(rng.randrange(5, 15)):
+            cdn = rng.choice(CDN_HOSTS)
+            reqs.append((rng.choice(["font", "stylesheet", "script", "image"]), f"https://{cdn}/s/{rng.randrange(10**6)}"))
+        reqs.append(("xhr", f"{host}/wp-admin/admin-ajax.php?action=wpfd&id={n}"))
+        rng.shuffle(reqs)
+        lines += [f"{kind}\t{page}\t{url}" for kind, url in reqs]
+    return "\n".join(lines) + "\n"
+
+
+def write_fixtures():
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    pages = {
+        "category_physics_page1.html": category_page("physics", 1),
+        "category_physics_page17.html": category_page("physics", 17, per_page=24, sidebar=20),
+        # Sinhala titles with no <meta charset>: every backend must still decode them as UTF-8
+        "category_physics_si_nometa.html": category_page("physics-si", 2, subject="භෞතික විද්‍යාව", meta_charset=False),
+        "empty.html": "",
+    }
+    for name, html in pages.items():
+        with open(os.path.join(FIXTURE_DIR, name), "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"Wrote {name} ({len(html) // 1024} KiB)")
+
+
+if __name__ == "__main__":
+    write_fixtures()
@@ -0,0 +1,314 @@
+"""Local stand-in for pastpapers.wiki, for offline benchmarks.
+
+Serves synthetic category listings (fixtures.category_page) and post pages in
+the three download layouts the downloader has to handle, plus synthetic PDFs.
+Latency, error responses and ad-request noise are configurable.
+
+    python benchmarks/standin.py [--port 8800] [--latency 0.1] [--error-rate 0.05]
+
+Post layouts, picked per post from its slug:
+  link            static a.wpfd_downloadlink to /files/<slug>.pdf (HTTP fast path)
+  js-click        the button is added by JS and fetches the PDF when clicked
+                  (no href in the static HTML: needs the click + expect_response flow)
+  download-event  the JS-added button points at an attachment that is not served
+                  as application/pdf (only the last-resort expect_download flow gets it,
+                  clicking the button on the post that is already loaded)
+"""
+import argparse
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fixtures import category_page
+
+LAYOUTS = ("link", "js-click", "download-event")
+
+POST_PAGE = """<!doctype html>
+<html lang="en-US">
+<head>
+<meta charset="UTF-8" />
+<title>{title} - Past Papers WiKi</title>
+{ads}
+</head>
+<body class="post-template-default single single-post jnews">
+<div class="jeg_viewport"><div class="jeg_main"><div class="jeg_container"><div class="jeg_content">
+  <div class="entry-header"><h1 class="jeg_post_title">{title}</h1></div>
+  <div class="content-inner">
+    <p>{title}. Download the PDF below.</p>
+    <div class="wpfd-single-file" id="dl">{button}</div>
+  </div>
+</div></div></div></div>
+{script}
+</body>
+</html>"""
+
+# adds the download button after the page has loaded, like the wpfd plugin does
+JS_BUTTON = """<script>
+setTimeout(function () {{
+  var a = document.createElement("a");
+  a.className = "wpfd_downloadlink";
+  a.textContent = "Download";
+  {action}
+  document.getElementById("dl").appendChild(a);
+}}, {delay});
+</script>"""
+
+# keeps the network busy for as long as the page is open, like the real site's ads
+AD_POLLER = """<script>
+setInterval(function () {{ fetch("/ads/ping?" + Date.now()).catch(function () {{}}); }}, {interval});
+</script>"""
+
+
+def synthetic_pdf(slug, size):
+    """`size` bytes of PDF-looking data, unique per slug so content dedup doesn't kick in"""
+    head = f"%PDF-1.4\n% {slug}\n".encode()
+    tail = b"\n%%EOF\n"
+    filler = max(0, size - len(head) - len(tail))
+    block = (b"0123456789abcdef" * 4096)
+    body = block * (filler // len(block)) + block[:filler % len(block)]
+    return head + body + tail
+
+
+class StandIn:
+    """Threaded HTTP server standing in for pastpapers.wiki.
+
+    latency/jitter   seconds added to every page and PDF response (uniform jitter)
+    error_rate       fraction of page and PDF requests answered with error_status
+                     (429 and 503 carry Retry-After: 1)
+    ad_requests      ad scripts/images referenced by each post page; served from
+                     /ads/ after ad_latency seconds, with a poller that keeps the
+                     network busy
+    pdf_size         bytes per synthetic PDF; pdf_rate caps bytes/s per download (0 = no cap)
+    layouts          post layouts to rotate through
+    n_pages/per_page size of each category listing
+    """
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 ad_requests=20, ad_latency=0.5, pdf_size=512 * 1024, pdf_rate=0,
+                 layouts=LAYOUTS, n_pages=10, per_page=12, js_delay=300, seed=0):
+        for layout in layouts:
+            if layout not in LAYOUTS:
+                raise ValueError(f"Unknown layout {layout!r}; expected one of {', '.join(LAYOUTS)}")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.ad_requests = ad_requests
+        self.ad_latency = ad_latency
+        self.pdf_size = pdf_size
+        self.pdf_rate = pdf_rate
+        self.layouts = tuple(layouts)
+        self.n_pages = n_pages
+        self.per_page = per_page
+        self.js_delay = js_delay
+        self.rng = random.Random(seed)
+        self.hits = {}   # kind -> count
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._pdfs = {}
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def category_url(self, category="physics"):
+        return f"{self.base_url}/category/{category}/"
+
+    def post_urls(self, n):
+        """`n` post URLs, layouts in equal rotation"""
+        return [f"{self.base_url}/bench-paper-{k}-{self.layouts[k % len(self.layouts)]}/" for k in range(n)]
+
+    def layout_of(self, slug):
+        for layout in self.layouts:
+            if slug.endswith("-" + layout):
+                return layout
+        return self.layouts[zlib.crc32(slug.encode()) % len(self.layouts)]
+
+    def pdf(self, slug):
+        with self._lock:
+            if slug not in self._pdfs:
+                self._pdfs[slug] = synthetic_pdf(slug, self.pdf_size)
+            return self._pdfs[slug]
+
+    def count(self, kind):
+        with self._lock:
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+
+    def delay(self):
+        with self._lock:
+            extra = self.rng.uniform(0, self.jitter) if self.jitter else 0.0
+        if self.latency or extra:
+            time.sleep(self.latency + extra)
+
+    def should_fail(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            fail = self.rng.random() < self.error_rate
+            self.errors += fail
+        return fail
+
+    def post_page(self, slug):
+        title = slug.replace("-", " ").title()
+        layout = self.layout_of(slug)
+        ads = "\n".join(
+            f'<script async src="/ads/ad{k}.js"></script>' if k % 2 else f'<img src="/ads/banner{k}.gif" alt="" />'
+            for k in range(self.ad_requests)
+        )
+        if self.ad_requests:
+            ads += AD_POLLER.format(interval=500)
+        button, script = "", ""
+        if layout == "link":
+            button = f'<a class="wpfd_downloadlink" href="/files/{slug}.pdf">Download</a>'
+        elif layout == "js-click":
+            action = f'a.href = "#"; a.onclick = function (e) {{ e.preventDefault(); fetch("/stream/{slug}"); }};'
+            script = JS_BUTTON.format(action=action, delay=self.js_delay)
+        else:
+            script = JS_BUTTON.format(action=f'a.href = "/attachment/{slug}";', delay=self.js_delay)
+        return POST_PAGE.format(title=title, ads=ads, button=button, script=script)
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, body, content_type, status=200, headers=()):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def send_error_status(self):
+                headers = [("Retry-After", "1")] if standin.error_status in (429, 503) else []
+                self.send_body(b"busy", "text/plain", standin.error_status, headers)
+
+            def send_pdf(self, slug, content_type, disposition=None):
+                data = standin.pdf(slug)
+                etag = f'"{zlib.crc32(data):08x}-{len(data)}"'
+                start = 0
+                m = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+                if m and self.headers.get("If-Range", etag) == etag:
+                    start = int(m.group(1))
+                    if start >= len(data):
+                        return self.send_body(b"", content_type, 416, [("Content-Range", f"bytes */{len(data)}")])
+                self.send_response(206 if start else 200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data) - start))
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", etag)
+                if start:
+                    self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                if disposition:
+                    self.send_header("Content-Disposition", disposition)
+                self.end_headers()
+                if self.command == "HEAD":
+                    return
+                chunk = 64 * 1024
+                for pos in range(start, len(data), chunk):
+                    self.wfile.write(data[pos:pos + chunk])
+                    if standin.pdf_rate:
+                        time.sleep(chunk / standin.pdf_rate)
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                try:
+                    if path.startswith("/ads/"):
+                        standin.count("ad")
+                        time.sleep(standin.ad_latency)
+                        kind = "image/gif" if path.endswith(".gif") else "application/javascript"
+                        return self.send_body(b"/* ad */", kind)
+                    if path == "/favicon.ico":
+                        return self.send_body(b"", "image/x-icon", 404)
+
+                    standin.delay()
+                    if standin.should_fail():
+                        return self.send_error_status()
+
+                    m = re.fullmatch(r"/category/([\w-]+)/(?:page/(\d+)/)?", path)
+                    if m:
+                        standin.count("category")
+                        page = int(m.group(2) or 1)
+                        if page > standin.n_pages:
+                            return self.send_body(b"not found", "text/html", 404)
+                        html = category_page(m.group(1), page, n_pages=standin.n_pages,
+                                             per_page=standin.per_page, host=standin.base_url)
+                        return self.send_body(html.encode(), "text/html; charset=UTF-8")
+                    m = re.fullmatch(r"/files/([\w-]+)\.pdf", path)
+                    if m:
+                        standin.count("pdf")
+                        return self.send_pdf(m.group(1), "application/pdf")
+                    m = re.fullmatch(r"/stream/([\w-]+)", path)
+                    if m:
+                        standin.count("pdf")
+                        return self.send_pdf(m.group(1), "application/pdf")
+                    m = re.fullmatch(r"/attachment/([\w-]+)", path)
+                    if m:
+                        standin.count("pdf")
+                        return self.send_pdf(m.group(1), "application/octet-stream",
+                                             f'attachment; filename="{m.group(1)}.pdf"')
+                    m = re.fullmatch(r"/([\w-]+)/", path)
+                    if m:
+                        standin.count("post")
+                        return self.send_body(standin.post_page(m.group(1)).encode(), "text/html; charset=UTF-8")
+                    self.send_body(b"not found", "text/html", 404)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--port", type=int, default=8800)
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--error-status", type=int, default=503)
+    ap.add_argument("--ads", type=int, default=20, help="ad requests per post page")
+    ap.add_argument("--pdf-size", type=int, default=512 * 1024)
+    ap.add_argument("--layouts", default=",".join(LAYOUTS))
+    args = ap.parse_args()
+
+    standin = StandIn(args.port, args.latency, args.jitter, args.error_rate, args.error_status,
+                      ad_requests=args.ads, pdf_size=args.pdf_size, layouts=args.layouts.split(","))
+    print(f"Serving on {standin.base_url}")
+    print(f"  category: {standin.category_url()}")
+    for url in standin.post_urls(len(standin.layouts)):
+        print(f"  post:     {url}")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
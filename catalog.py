@@ -0,0 +1,395 @@
+"""Local SQLite catalog of scraped papers, with fields parsed from titles and URL slugs.
+
+    python catalog.py past_papers.sqlite3 --add papers.ndjson
+    python catalog.py past_papers.sqlite3 --subject physics --grade 13 --year 2023 --kind "marking scheme"
+    python catalog.py past_papers.sqlite3 --search "royal college" --urls
+    python catalog.py past_papers.sqlite3 --facet school --year 2023
+"""
+import argparse
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from export import PAPER_FIELDS, read_export
+
+# bump when parse_paper changes, so older rows get re-parsed on open
+PARSER_VERSION = 2
+
+# alias -> canonical subject; longer aliases win ("combined maths" before "maths")
+SUBJECTS = {
+    'combined mathematics': 'combined mathematics', 'combined maths': 'combined mathematics',
+    'combined science': 'combined science', 'general english': 'general english',
+    'agricultural science': 'agricultural science', 'business studies': 'business studies',
+    'information technology': 'ict', 'ict': 'ict', 'health science': 'health science',
+    'physics': 'physics', 'chemistry': 'chemistry', 'biology': 'biology',
+    'mathematics': 'mathematics', 'maths': 'mathematics', 'science': 'science',
+    'accounting': 'accounting', 'economics': 'economics', 'geography': 'geography',
+    'history': 'history', 'buddhism': 'buddhism', 'english': 'english', 'sinhala': 'sinhala',
+    'tamil': 'tamil',
+}
+PROVINCES = ('north western', 'north central', 'western', 'central', 'southern', 'northern', 'eastern',
+             'uva', 'sabaragamuwa')
+TERMS = {'1st': 1, 'first': 1, '2nd': 2, 'second': 2, '3rd': 3, 'third': 3}
+
+
+def _words(options):
+    return '|'.join(re.escape(o).replace(r'\ ', r'\s+') for o in sorted(options, key=len, reverse=True))
+
+
+MEDIUM_RE = re.compile(r'\b(sinhala|tamil|english)\s+medium\b', re.I)
+SUBJECT_RE = re.compile(rf'\b({_words(SUBJECTS)})\b', re.I)
+PROVINCE_RE = re.compile(rf'\b({_words(PROVINCES)})\s+province\b', re.I)
+YEAR_RE = re.compile(r'\b(19[89]\d|20[0-4]\d)\b')
+GRADE_RE = re.compile(r'\bgrade\s*(\d{1,2})\b', re.I)
+LEVEL_RE = re.compile(r'\b([ao])\s*/\s*l\b', re.I)   # A/L = grade 13, O/L = grade 11
+TERM_RE = re.compile(rf'\b({_words(TERMS)})\s+term\b', re.I)
+SCHEME_RE = re.compile(r'\b(marking\s+schemes?)\b', re.I)
+PAPER_RE = re.compile(r'\b(papers?|tests?|exam(?:ination)?s?)\b', re.I)
+# words left over around a school's name once the parsed fields are cut out
+FILLER_RE = re.compile(r'\b(term|test|past|model|paper|papers|exam|examination|answers?|and|with|pdf|download|'
+                       r'\d+|[ao]\s*/\s*l)\b|[–—\-_|:,()]', re.I)
+
+FIELDS = ('subject', 'grade', 'year', 'term', 'medium', 'kind', 'school', 'province')
+INT_FIELDS = ('grade', 'year', 'term')
+TEXT_COLUMNS = tuple(f for f in PAPER_FIELDS if f != 'url')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    id          INTEGER PRIMARY KEY,
+    url         TEXT NOT NULL UNIQUE,
+    title       TEXT NOT NULL,
+    description TEXT,
+    image       TEXT,
+    subject     TEXT COLLATE NOCASE,
+    grade       INTEGER,
+    year        INTEGER,
+    term        INTEGER,
+    medium      TEXT COLLATE NOCASE,
+    kind        TEXT COLLATE NOCASE,
+    school      TEXT COLLATE NOCASE,
+    province    TEXT COLLATE NOCASE,
+    parser      INTEGER NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS papers_subject_grade_year ON papers (subject, grade, year);
+CREATE INDEX IF NOT EXISTS papers_year_kind ON papers (year, kind);
+CREATE INDEX IF NOT EXISTS papers_kind ON papers (kind);
+CREATE INDEX IF NOT EXISTS papers_school ON papers (school);
+CREATE INDEX IF NOT EXISTS papers_province ON papers (province);
+CREATE INDEX IF NOT EXISTS papers_parser ON papers (parser);
+"""
+
+# full-text index over the text columns, kept in step with `papers` by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+    title, description, school, content='papers', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS papers_fts_insert AFTER INSERT ON papers BEGIN
+    INSERT INTO papers_fts (rowid, title, description, school) VALUES (new.id, new.title, new.description, new.school);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_fts_delete AFTER DELETE ON papers BEGIN
+    INSERT INTO papers_fts (papers_fts, rowid, title, description, school)
+    VALUES ('delete', old.id, old.title, old.description, old.school);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_fts_update AFTER UPDATE ON papers BEGIN
+    INSERT INTO papers_fts (papers_fts, rowid, title, description, school)
+    VALUES ('delete', old.id, old.title, old.description, old.school);
+    INSERT INTO papers_fts (rowid, title, description, school) VALUES (new.id, new.title, new.description, new.school);
+END;
+"""
+
+
+def slug_text(url):
+    """The words of a post URL's slug ('royal-college-physics-...-2023-grade-13' -> 'royal college physics ...')"""
+    parts = [p for p in urlparse(url or '').path.split('/') if p]
+    return parts[-1].replace('-', ' ') if parts else ''
+
+
+# type names that mean exactly one of the kinds (anything else, like 'Model Paper', is matched as a title phrase)
+KIND_NAMES = {'marking scheme': 'marking scheme', 'marking schemes': 'marking scheme',
+              'paper': 'paper', 'papers': 'paper'}
+
+
+def title_kind(text):
+    """'marking scheme' or 'paper' for a title that says which it is; None if it doesn't"""
+    if SCHEME_RE.search(text or ''):
+        return 'marking scheme'
+    if PAPER_RE.search(text or ''):
+        return 'paper'
+    return None
+
+
+def normalize_kind(value):
+    """'marking scheme' or 'paper' for a type that means exactly that ('Marking Scheme', 'Paper'); else None"""
+    return KIND_NAMES.get(' '.join((value or '').lower().split()))
+
+
+def normalize_subject(value):
+    m = SUBJECT_RE.fullmatch((value or '').strip())
+    return SUBJECTS[' '.join(m.group(1).lower().split())] if m else value
+
+
+def parse_paper(paper):
+    """subject, grade, year, term, medium, kind, school and province of a paper, from its title
+    (falling back to the URL slug for anything the title doesn't say); None where unknown"""
+    title = paper.get('title') or ''
+    slug = slug_text(paper.get('url'))
+    fields = dict.fromkeys(FIELDS)
+    rest = title or slug
+
+    def first(regex, *texts):
+        for text in texts:
+            m = regex.search(text)
+            if m:
+                return m
+        return None
+
+    m = first(MEDIUM_RE, title, slug)
+    if m:
+        fields['medium'] = m.group(1).lower()
+        rest = MEDIUM_RE.sub(' ', rest)
+    m = first(SUBJECT_RE, rest, MEDIUM_RE.sub(' ', slug))
+    if m:
+        fields['subject'] = SUBJECTS[' '.join(m.group(1).lower().split())]
+    m = first(PROVINCE_RE, title, slug)
+    if m:
+        fields['province'] = ' '.join(m.group(1).split()).title()
+    m = first(YEAR_RE, title, slug)
+    if m:
+        fields['year'] = int(m.group(1))
+    m = first(GRADE_RE, title, slug)
+    if m:
+        fields['grade'] = int(m.group(1))
+    else:
+        m = first(LEVEL_RE, title)
+        if m:
+            fields['grade'] = 13 if m.group(1).lower() == 'a' else 11
+    m = first(TERM_RE, title, slug)
+    if m:
+        fields['term'] = TERMS[m.group(1).lower()]
+    fields['kind'] = title_kind(title) or title_kind(slug)
+
+    # the school is whatever is left once everything recognised is cut out
+    for regex in (SUBJECT_RE, PROVINCE_RE, YEAR_RE, GRADE_RE, TERM_RE, SCHEME_RE, FILLER_RE):
+        rest = regex.sub(' ', rest)
+    school = ' '.join(rest.split())
+    if re.search(r'[a-z]{3}', school, re.I):
+        fields['school'] = school if title else school.title()
+    return fields
+
+
+def fts_query(text=None, phrase=None):
+    """An FTS5 MATCH expression: every word of `text` must appear, as a word prefix, and the
+    title must contain `phrase` (its words in order, the last one possibly cut short)"""
+    terms = [f'"{w}"*' for w in re.findall(r'\w+', text or '')]
+    if phrase:
+        words = ' '.join(re.findall(r'\w+', phrase))
+        terms.append(f'title : "{words}"*')
+    return ' '.join(terms)
+
+
+class Catalog:
+    """Persistent catalog of papers with parsed fields, indexed for multi-field queries.
+
+    Fields are parsed once, when a paper is added or changed (or when PARSER_VERSION
+    moves on). Field filters use the column indexes; `text` searches title,
+    description and school through an FTS5 index (plain LIKE matching if this
+    SQLite has no FTS5).
+    """
+
+    def __init__(self, path='past_papers.sqlite3'):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            had_fts = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'papers_fts'").fetchone()
+            try:
+                self.conn.executescript(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False
+            if self.fts and not had_fts:
+                # rows added while the index didn't exist
+                self.conn.execute("INSERT INTO papers_fts (papers_fts) VALUES ('rebuild')")
+        self.reparse()
+
+    def add(self, papers):
+        """Insert new papers and update changed ones; returns how many rows were written.
+
+        Unchanged papers are skipped before parsing, so re-adding a whole crawl is cheap.
+        """
+        latest = {paper['url']: paper for paper in papers}
+        stored = self._stored(latest)
+        rows = []
+        now = time.time()
+        for url, paper in latest.items():
+            if stored.get(url) == tuple(paper.get(c) for c in TEXT_COLUMNS):
+                continue
+            fields = parse_paper(paper)
+            rows.append((*(paper.get(f) for f in PAPER_FIELDS), *(fields[f] for f in FIELDS),
+                         PARSER_VERSION, now))
+        if not rows:
+            return 0
+        cols = (*PAPER_FIELDS, *FIELDS, 'parser', 'updated_at')
+        changed = ' OR '.join(f'{c} IS NOT excluded.{c}' for c in TEXT_COLUMNS)
+        with self._lock, self.conn:
+            cur = self.conn.executemany(
+                f"INSERT INTO papers ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}) "
+                f"ON CONFLICT (url) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in cols if c != 'url')} "
+                f"WHERE {changed}",
+                rows,
+            )
+            return cur.rowcount
+
+    def _stored(self, urls):
+        """url -> stored (title, description, image) for the already catalogued ones of `urls`"""
+        urls = list(urls)
+        stored = {}
+        with self._lock:
+            for k in range(0, len(urls), 500):
+                chunk = urls[k:k + 500]
+                rows = self.conn.execute(
+                    f"SELECT url, {', '.join(TEXT_COLUMNS)} FROM papers WHERE url IN ({', '.join('?' for _ in chunk)})",
+                    chunk,
+                )
+                stored.update((row[0], tuple(row[1:])) for row in rows)
+        return stored
+
+    def add_export(self, path):
+        """Catalog the papers of an NDJSON/CSV export (the last version of each, as in latest_records)"""
+        return self.add(read_export(path))
+
+    def reparse(self):
+        """Re-parse rows parsed by an older PARSER_VERSION; returns the number updated"""
+        with self._lock:
+            stale = self.conn.execute(
+                f"SELECT id, {', '.join(PAPER_FIELDS)} FROM papers WHERE parser < ?", (PARSER_VERSION,)
+            ).fetchall()
+        if not stale:
+            return 0
+        updates = []
+        for row in stale:
+            fields = parse_paper(dict(row))
+            updates.append((*(fields[f] for f in FIELDS), PARSER_VERSION, row['id']))
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"UPDATE papers SET {', '.join(f'{f} = ?' for f in FIELDS)}, parser = ? WHERE id = ?", updates)
+        return len(updates)
+
+    def _where(self, text, filters, phrase=None):
+        unknown = set(filters) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown catalog fields: {', '.join(sorted(unknown))}")
+        clauses, params = [], []
+        for field, value in filters.items():
+            if value is None:
+                continue
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            if field in INT_FIELDS:
+                values = [int(v) for v in values]
+            elif field == 'kind':
+                values = [normalize_kind(v) or v for v in values]
+            elif field == 'subject':
+                values = [normalize_subject(v) for v in values]
+            clauses.append(f"p.{field} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        join = ''
+        if (text or phrase) and self.fts:
+            join = 'JOIN papers_fts ON papers_fts.rowid = p.id'
+            clauses.append('papers_fts MATCH ?')
+            params.append(fts_query(text, phrase))
+        elif text or phrase:
+            for word in re.findall(r'\w+', text or ''):
+                clauses.append("(p.title LIKE ? OR p.school LIKE ?)")
+                params.extend([f'%{word}%'] * 2)
+            if phrase:
+                clauses.append("p.title LIKE ?")
+                params.append(f"%{' '.join(phrase.split())}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return join, where, params
+
+    def query(self, text=None, limit=None, phrase=None, **filters):
+        """Papers matching every given field (a list means any of), the search text and
+        the title phrase.
+
+        Fields: subject, grade, year, term, medium, kind, school, province. Search
+        results come best match first, others newest year first.
+        """
+        join, where, params = self._where(text, filters, phrase)
+        order = 'papers_fts.rank' if join else 'p.year DESC, p.title'
+        sql = f"SELECT p.* FROM papers p {join} {where} ORDER BY {order}"
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{k: row[k] for k in row.keys() if k not in ('id', 'parser', 'updated_at')} for row in rows]
+
+    def count(self, text=None, phrase=None, **filters):
+        join, where, params = self._where(text, filters, phrase)
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM papers p {join} {where}", params).fetchone()[0]
+
+    def facets(self, field, text=None, phrase=None, **filters):
+        """{value: number of papers} for one field, over the papers matching the filters"""
+        if field not in FIELDS:
+            raise ValueError(f"Unknown catalog field {field!r}; expected one of {', '.join(FIELDS)}")
+        join, where, params = self._where(text, filters, phrase)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT p.{field}, COUNT(*) FROM papers p {join} {where} GROUP BY p.{field} ORDER BY COUNT(*) DESC",
+                params,
+            ).fetchall()
+        return {value: n for value, n in rows}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('path', help='catalog database (created if missing)')
+    ap.add_argument('--add', action='append', default=[], metavar='EXPORT',
+                    help='catalog the papers of this .ndjson/.csv export first (repeatable)')
+    ap.add_argument('--search', help='full-text search over title, description and school')
+    for field in FIELDS:
+        ap.add_argument(f'--{field}', action='append', help=f'only papers with this {field} (repeatable: any of)')
+    ap.add_argument('--facet', choices=FIELDS, help='count the matching papers per value of this field instead')
+    ap.add_argument('--limit', type=int)
+    ap.add_argument('--urls', action='store_true', help='print just the URLs')
+    args = ap.parse_args()
+
+    with Catalog(args.path) as catalog:
+        for path in args.add:
+            print(f"Catalogued {catalog.add_export(path)} new or changed papers from {path}")
+        filters = {f: getattr(args, f) for f in FIELDS}
+        if args.facet:
+            for value, n in catalog.facets(args.facet, args.search, **filters).items():
+                print(f"{n:>7}  {value}")
+            return
+        papers = catalog.query(args.search, args.limit, **filters)
+        for paper in papers:
+            if args.urls:
+                print(paper['url'])
+            else:
+                details = ', '.join(f"{f} {paper[f]}" for f in FIELDS if paper[f] is not None and f != 'school')
+                print(f"- {paper['title']}\n  {paper['url']}\n  {details}")
+        if not args.urls:
+            print(f"\n{len(papers)} papers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+import os
+import re
+import time
+import hashlib
+import requests
+
+CHUNK_SIZE = 64 * 1024   # bytes held in memory per download at any time
+MAX_RETRIES = 3
+THROTTLE_STATUSES = (429, 503)
+
+
+class Throttled(requests.HTTPError):
+    """The server asked us to slow down (429/503); retry_after is the Retry-After header, if any"""
+
+    def __init__(self, url, status, retry_after=None):
+        super().__init__(f"{url} answered {status} (Retry-After: {retry_after or '-'})")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+
+def raise_if_throttled(resp):
+    if resp.status_code in THROTTLE_STATUSES:
+        raise Throttled(resp.url, resp.status_code, resp.headers.get("retry-after"))
+
+
+class DownloadSink:
+    """Streams a download into `<path>.part` and atomically renames it into place.
+
+    A leftover .part file from an interrupted transfer is kept so the next
+    attempt can resume it with an HTTP Range request; the response's validator
+    (ETag or Last-Modified) is kept beside it in `<path>.part.validator` for If-Range.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.part_path = path + ".part"
+        self.validator_path = self.part_path + ".validator"
+        self._fh = None
+        self.bytes_written = 0
+        self.received = 0      # bytes written by this sink, i.e. not counting a resumed prefix
+        self.write_s = 0.0     # time spent in file writes and the final fsync
+        self.hasher = hashlib.sha256()
+
+    def resume_offset(self):
+        """Size of the partial file already on disk (0 if none)"""
+        try:
+            return os.path.getsize(self.part_path)
+        except OSError:
+            return 0
+
+    def resume_validator(self):
+        """ETag or Last-Modified of the response the partial file came from (None if unknown)"""
+        try:
+            with open(self.validator_path, encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def open(self, resume=False, validator=None):
+        """Start writing the partial file; a fresh start records `validator` for later resumes"""
+        self.hasher = hashlib.sha256()
+        if not resume:
+            self._remove(self.validator_path)
+            if validator:
+                with open(self.validator_path, "w", encoding="utf-8") as f:
+                    f.write(validator)
+        if resume:
+            # bring the hash up to date with the bytes we already have
+            with open(self.part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    self.hasher.update(chunk)
+        self._fh = open(self.part_path, "ab" if resume else "wb")
+        self.bytes_written = self._fh.tell()
+
+    def write(self, chunk):
+        start = time.perf_counter()
+        self._fh.write(chunk)
+        self.write_s += time.perf_counter() - start
+        self.hasher.update(chunk)
+        self.bytes_written += len(chunk)
+        self.received += len(chunk)
+
+    @property
+    def sha256(self):
+        return self.hasher.hexdigest()
+
+    def close(self):
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+    def commit(self):
+        """Flush the partial file to disk and move it to its final name"""
+        start = time.perf_counter()
+        if self._fh:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self.close()
+        os.replace(self.part_path, self.path)
+        self._remove(self.validator_path)
+        self.write_s += time.perf_counter() - start
+        return self.path
+
+    def discard(self):
+        self.close()
+        self._remove(self.part_path)
+        self._remove(self.validator_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def write_all(self, body):
+        """Write an already-buffered body through the sink (for responses that can't be streamed)"""
+        self.open()
+        for start in range(0, len(body), CHUNK_SIZE):
+            self.write(body[start:start + CHUNK_SIZE])
+        return self.commit()
+
+
+def file_digest(path):
+    """(size, sha256 hex) of a file on disk, read in CHUNK_SIZE pieces"""
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+            size += len(chunk)
+    return size, hasher.hexdigest()
+
+
+def looks_like_pdf(content_type, first_chunk):
+    return "pdf" in (content_type or "").lower() or first_chunk.startswith(b"%PDF")
+
+
+def range_validator(resp):
+    """Value for a later If-Range: a strong ETag, else Last-Modified (weak ETags can't be used)"""
+    etag = resp.headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return resp.headers.get("last-modified")
+
+
+def content_range_start(resp):
+    """First byte offset of a 206 response's Content-Range (None if missing or unparsable)"""
+    m = re.match(r"\s*bytes\s+(\d+)-", resp.headers.get("content-range", ""))
+    return int(m.group(1)) if m else None
+
+
+def stream_download(session, url, path, cookies=None, timeout=60, retries=MAX_RETRIES,
+                    etag=None, last_modified=None):
+    """Stream `url` into `path`, resuming a partial file with Range requests on retry.
+
+    A partial file is only resumed with If-Range and the validator it was saved
+    under, and only if the 206 starts exactly where it ends; otherwise the
+    download starts again from zero.
+
+    Passing `etag` / `last_modified` makes it a conditional GET. Returns a dict
+    with path, size, sha256, etag, last_modified and not_modified (plus received
+    bytes, write_s disk time and ttfb_s response time for this call), or None if the server answered
+    with something that isn't a PDF. Raises Throttled on 429/503
+    and requests.RequestException once all retries are used up.
+    """
+    sink = DownloadSink(path)
+
+    def info(resp, not_modified=False):
+        size, sha256 = (sink.bytes_written, sink.sha256) if not not_modified else (None, None)
+        return {
+            "path": path, "size": size, "sha256": sha256, "not_modified": not_modified,
+            "received": sink.received, "write_s": sink.write_s, "ttfb_s": resp.elapsed.total_seconds(),
+            "etag": resp.headers.get("etag", etag), "last_modified": resp.headers.get("last-modified", last_modified),
+        }
+
+    for attempt in range(1, retries + 1):
+        offset = sink.resume_offset()
+        validator = sink.resume_validator() if offset else None
+        if offset and not validator:
+            # nothing to tell us the file hasn't changed since, so don't append to it
+            sink.discard()
+            offset = 0
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        try:
+            with session.get(url, headers=headers, cookies=cookies, stream=True, timeout=timeout) as resp:
+                if resp.status_code == 304:
+                    return info(resp, not_modified=True)
+                raise_if_throttled(resp)
+                if resp.status_code == 416 and offset:
+                    # nothing left to send: the partial file is already complete
+                    sink.open(resume=True)
+                    sink.commit()
+                    return info(resp)
+                if resp.status_code not in (200, 206):
+                    print(f"→ {url} returned status {resp.status_code}")
+                    return None
+
+                if resp.status_code == 206 and content_range_start(resp) != offset:
+                    print(f"→ {url} answered Range {offset}- with {resp.headers.get('content-range')!r}; restarting from zero")
+                    sink.discard()
+                    continue
+                resume = resp.status_code == 206 and offset > 0
+                chunks = resp.iter_content(chunk_size=CHUNK_SIZE)
+                first = next(chunks, b"")
+                if not resume and not looks_like_pdf(resp.headers.get("content-type"), first):
+                    return None
+
+                # a 200 means the server ignored our Range header (or If-Range failed), so start over
+                sink.open(resume=resume, validator=range_validator(resp))
+                sink.write(first)
+                for chunk in chunks:
+                    sink.write(chunk)
+                sink.commit()
+                return info(resp)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            sink.close()
+            if attempt == retries:
+                raise
+            print(f"→ transfer interrupted at {sink.resume_offset()} bytes ({e}); resuming (attempt {attempt + 1}/{retries})")
+            time.sleep(attempt)
+        except Exception:
+            sink.close()
+            raise
+    raise requests.HTTPError(f"{url} kept answering with a byte range we didn't ask for")
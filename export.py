@@ -0,0 +1,170 @@
+import csv
+import hashlib
+import json
+import os
+import time
+
+# every export has exactly these columns, whatever keys the first paper happens to have
+PAPER_FIELDS = ('title', 'url', 'description', 'image')
+
+FORMATS = {'.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv'}
+MODES = ('w', 'append', 'merge')
+
+
+def export_format(path):
+    """'ndjson' or 'csv' from the file extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Can't tell the export format of {path!r}; use one of {', '.join(FORMATS)}")
+    return FORMATS[ext]
+
+
+def fingerprint(paper, fields=PAPER_FIELDS):
+    """Stable hash of a paper's exported values (missing and None count as empty)"""
+    values = ['' if paper.get(f) is None else str(paper.get(f)) for f in fields]
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _repair_tail(path):
+    """Cut a half-written last line left by a crash, so appends start on a fresh line"""
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        # walk back to the last newline
+        pos = size
+        while pos > 0:
+            step = min(64 * 1024, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            nl = chunk.rfind(b'\n')
+            if nl >= 0:
+                f.truncate(pos + nl + 1)
+                return
+        f.truncate(0)
+
+
+def read_export(path):
+    """Yield the records of an NDJSON or CSV export in file order.
+
+    Appended/merged exports can hold several versions of a paper; the last one wins
+    (see latest_records). A truncated last line is skipped.
+    """
+    if export_format(path) == 'ndjson':
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # half-written by a crash
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if None in row.values():
+                    break  # short row: half-written by a crash
+                yield {k: (v or None) for k, v in row.items()}
+
+
+def latest_records(path):
+    """The export's papers with only the latest version of each URL, in first-seen order"""
+    latest = {}
+    for paper in read_export(path):
+        latest[paper['url']] = paper
+    return list(latest.values())
+
+
+class PaperWriter:
+    """Writes papers to an NDJSON or CSV file one at a time, as they are scraped.
+
+    Nothing is held in memory but the open file (and, when appending or merging,
+    a fingerprint per exported URL). The file is flushed and fsynced every
+    `flush_every` papers or `flush_interval` seconds, so a crash loses at most
+    that much.
+
+    Modes:
+      'w'       start a new file
+      'append'  add papers whose URL isn't in the file yet
+      'merge'   like append, but a paper whose exported values changed is appended
+                again; read_export / latest_records take the last version
+    """
+
+    def __init__(self, path, mode='w', fields=PAPER_FIELDS, flush_every=100, flush_interval=5.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown export mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.path = path
+        self.format = export_format(path)
+        self.mode = mode
+        self.fields = tuple(fields)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.skipped = 0
+        self.known = {}   # url -> fingerprint of its exported version
+
+        existing = mode != 'w' and os.path.exists(path) and os.path.getsize(path) > 0
+        if existing:
+            _repair_tail(path)
+            self._check_header()
+            for paper in read_export(path):
+                self.known[paper['url']] = fingerprint(paper, self.fields)
+        self._fh = open(path, 'a' if existing else 'w', newline='' if self.format == 'csv' else None,
+                        encoding='utf-8')
+        if self.format == 'csv':
+            self._csv = csv.DictWriter(self._fh, fieldnames=self.fields, extrasaction='ignore')
+            if not existing or os.path.getsize(path) == 0:
+                self._csv.writeheader()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def _check_header(self):
+        if self.format != 'csv':
+            return
+        with open(self.path, newline='', encoding='utf-8') as f:
+            header = next(csv.reader(f), None)
+        if header and tuple(header) != self.fields:
+            raise ValueError(f"{self.path} has columns {', '.join(header)}, expected {', '.join(self.fields)}; "
+                             f"export to a new file instead")
+
+    def write(self, paper):
+        """Export one paper; returns False if append/merge mode skipped it"""
+        if self.mode != 'w':
+            fp = fingerprint(paper, self.fields)
+            old = self.known.get(paper['url'])
+            if old is not None and (self.mode == 'append' or old == fp):
+                self.skipped += 1
+                return False
+            self.known[paper['url']] = fp
+
+        if self.format == 'csv':
+            self._csv.writerow(paper)
+        else:
+            record = {f: paper.get(f) for f in self.fields}
+            self._fh.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.written += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return True
+
+    def flush(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._fh:
+            self.flush()
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,16 +1,48 @@
 # improved_playwright_fast_download.py
 import os
 import re
-import time
 import signal
-import sys
+import asyncio
+import argparse
+import statistics
+import threading
+import json
+import time
+import queue as queue_mod
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from urllib.parse import urlparse
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
+import requests
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
+from scrape import PastPapersWikiScraper, USER_AGENT
+from download_sink import DownloadSink, Throttled, THROTTLE_STATUSES, raise_if_throttled, stream_download, file_digest
+from scheduler import HostScheduler, RetryTracker, retry_after_seconds, MIN_DELAY
+from manifest import Manifest
+from export import PaperWriter, MODES as EXPORT_MODES
+from catalog import Catalog, normalize_kind
+from timing import UrlTimer, TimingLog, summarize, print_summary
+from adblock import AdBlocker
 
 # --- Config ---
 HEADLESS = False # If you wanna see donwloading true the chromium.(OR other browser.. )
 SAVE_DIR = "physics_2023_grade13_papers_fast"
-os.makedirs(SAVE_DIR, exist_ok=True)
+CONCURRENCY = 4       # pages working in parallel on the one browser
+PER_HOST_LIMIT = 2    # max pages loading from the same host at once
+POLITE_DELAY = 1.1    # starting gap between requests to one host; adapts to the host's latency and errors
+FAST_PATH = True      # resolve + download over plain HTTP first, only fall back to Chromium when needed
+MANIFEST_PATH = os.path.join(SAVE_DIR, "manifest.sqlite3")  # remembers finished papers between runs
+REVALIDATE = False    # re-check finished papers with a conditional GET instead of skipping them outright
+FAILURE_REPORT = os.path.join(SAVE_DIR, "failures.json")  # URLs that still failed after retries, as JSON
+TIMING_LOG = os.path.join(SAVE_DIR, "timings.jsonl")     # per-URL stage timings, one JSON line per attempt (appended)
+QUEUE_SIZE = 100      # discovered URLs buffered ahead of the download stage
+PROCESSES = 1         # >1: shard the URLs over this many processes, each with its own Chromium (0 = one per core)
+WARM_START = False    # start Chromium with a saved profile as the run begins, not on the first URL HTTP can't handle
+BROWSER_PROFILE = os.path.join(SAVE_DIR, "browser-profile")  # warm start: Chromium profile (cookies, site storage) kept between runs
+SPARE_PAGES = 1       # routed pages kept open beyond one per browser worker, so a crashed page is replaced at once
+LINK_DUPLICATES = False  # duplicates: hard-link the stored copy under the page's own name instead of just pointing at it
+NAV_MODE = "link"     # "link": DOM ready + first PDF link; "networkidle": wait for the page to go quiet
+LINK_WAIT = 15_000    # ms to wait for a download link after the DOM is ready (link mode)
+LINK_SELECTOR = 'a.wpfd_downloadlink, a[href*=".pdf"]'
 
 # minimal ad / third-party blocking keywords (extend as needed)
 AD_KEYWORDS = [
@@ -18,6 +50,8 @@ AD_KEYWORDS = [
     "adserver", "tracking", "analytics", "facebook.net", "google-analytics", "gstatic", "taboola",
     "outbrain", "criteo", "scorecardresearch", "/banner", "adrotate"
 ]
+# extra EasyList / hosts-file style blocklists to load (paths); big lists cost nothing per request
+BLOCKLIST_FILES = []
 
 # your pages
 urls = [
@@ -51,9 +85,16 @@ def safe_filename(s: str) -> str:
     s = re.sub(r"\s+", " ", s).strip()
     return s
 
-def looks_like_ad(url: str) -> bool:
-    lu = url.lower()
-    return any(k in lu for k in AD_KEYWORDS)
+def make_blocker(keywords=AD_KEYWORDS, blocklist_files=BLOCKLIST_FILES):
+    blocker = AdBlocker(keywords)
+    for path in blocklist_files:
+        try:
+            print(f"→ loaded {blocker.load_hostlist(path)} blocked hosts from {path}")
+        except OSError as e:
+            print(f"→ couldn't read blocklist {path}:", e)
+    return blocker
+
+BLOCKER = make_blocker()
 
 def domain_of(url: str) -> str:
     try:
@@ -61,148 +102,411 @@ def domain_of(url: str) -> str:
     except Exception:
         return ""
 
-def signal_handler(sig, frame):
-    print("\n→ Ctrl+C detected — exiting cleanly.")
-    sys.exit(0)
+# Build a nice file name
+def make_nice_name(base_url, original_name=None):
+    school_match = re.search(r'([a-z0-9\-]+)-physics', base_url, re.I)
+    school = school_match.group(1).replace('-', ' ').title() if school_match else None
+    if original_name:
+        base = original_name
+    else:
+        base = f"{school or 'paper'} - 2023 Grade 13 Physics 1st Term"
+    name = safe_filename(base)
+    if not name.lower().endswith(".pdf"):
+        name += ".pdf"
+    return name
 
-signal.signal(signal.SIGINT, signal_handler)
+def label(i, total=None):
+    return f"[{i}/{total}]" if total else f"[{i}]"
 
-# --- Main script ---
-with sync_playwright() as p:
-    browser = p.chromium.launch(headless=HEADLESS, args=["--no-sandbox", "--disable-dev-shm-usage"])
-    # set a context; accept_downloads not required because we do direct fetch where possible
-    context = browser.new_context(user_agent="Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0 Safari/537.36")
-    page = context.new_page()
-    page.set_default_timeout(30_000)  # safer default
+def new_result(url):
+    return {"url": url, "saved": False, "path": None, "strategy": None, "pdf_href": None,
+            "size": None, "sha256": None, "etag": None, "last_modified": None,
+            "nav_mode": None, "nav_s": None, "link_s": None, "duplicate_of": None}
+
+_claimed_paths = {}
+_claim_lock = threading.Lock()
+
+def claim_path(manifest, url, out_path):
+    """A save path for `url` that won't overwrite another paper saved under the same name"""
+    base, ext = os.path.splitext(out_path)
+    path, n = out_path, 1
+    with _claim_lock:
+        while True:
+            owner = _claimed_paths.get(path)
+            taken_on_disk = manifest is not None and os.path.exists(path) and \
+                manifest.owned_by_other(os.path.basename(path), url)
+            # the manifest claim also keeps other processes sharing it (--processes) off this name
+            if (owner is None or owner == url) and not taken_on_disk and \
+                    (manifest is None or manifest.claim_file(os.path.basename(path), url)):
+                _claimed_paths[path] = url
+                return path
+            n += 1
+            path = f"{base} ({n}){ext}"
+
+def store_duplicate(existing_name, path):
+    """Point a duplicate at the stored copy; returns the path the result should use"""
+    existing = os.path.join(SAVE_DIR, existing_name)
+    if LINK_DUPLICATES and path:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+            os.link(existing, path)
+            return path
+        except OSError as e:
+            print("→ couldn't hard-link duplicate, pointing at the stored copy instead:", e)
+    return existing
+
+def reuse_by_href(manifest, url, download_href, i):
+    """Result reusing another page's finished download of the same PDF href, or None"""
+    if manifest is None:
+        return None
+    entry = manifest.done_for_href(download_href, SAVE_DIR, exclude_page=url)
+    if not entry:
+        return None
+    link_path = None
+    if LINK_DUPLICATES:
+        fname = make_nice_name(url, os.path.basename(urlparse(download_href).path))
+        link_path = claim_path(manifest, url, os.path.join(SAVE_DIR, fname))
+    path = store_duplicate(entry["filename"], link_path)
+    print(f"{label(i)} ≡ same PDF as {entry['page_url']} → {path} (not downloaded again)")
+    result = new_result(url)
+    result.update(saved=True, path=path, strategy="dedup", pdf_href=download_href, size=entry["size"],
+                  sha256=entry["sha256"], etag=entry["etag"], last_modified=entry["last_modified"],
+                  duplicate_of=entry["filename"])
+    return result
+
+def dedup_by_content(manifest, result):
+    """After a download: if identical bytes are already stored, keep only one copy"""
+    name = os.path.basename(result["path"])
+    existing = manifest.file_with_hash(result["sha256"], SAVE_DIR, exclude=name)
+    if existing:
+        os.remove(result["path"])
+        result["path"] = store_duplicate(existing, result["path"])
+        result["duplicate_of"] = existing
+        print(f"≡ {name} is identical to {existing}; stored once → {result['path']}")
+
+def finish_result(manifest, result):
+    """Dedup a finished download against the content index and record it in the manifest"""
+    if manifest is None:
+        return
+    if result["saved"] and result["sha256"]:
+        try:
+            if result["duplicate_of"] is None:
+                dedup_by_content(manifest, result)
+            st = os.stat(result["path"])
+            manifest.add_file(os.path.basename(result["path"]), result["size"], result["sha256"], st.st_mtime)
+        except OSError as e:
+            print("→ content dedup failed:", e)
+    manifest.record(
+        result["url"],
+        pdf_href=result["pdf_href"],
+        filename=os.path.basename(result["path"]) if result["path"] else None,
+        size=result["size"], sha256=result["sha256"],
+        etag=result["etag"], last_modified=result["last_modified"],
+        strategy=result["strategy"],
+        status="done" if result["saved"] else "failed",
+    )
+
+# --- Browserless fast path ---
+def make_http_scraper(pool_size=CONCURRENCY):
+    """A PastPapersWikiScraper whose session keeps up to `pool_size` pooled connections per host."""
+    return PastPapersWikiScraper("https://pastpapers.wiki/", max_workers=pool_size)
+
+def revalidate_download(scraper, entry, i, total, timer):
+    """Conditional GET on a finished paper's recorded PDF href, without visiting its page.
+
+    Returns a result dict, or None if the href no longer yields a PDF.
+    """
+    print(f"\n{label(i, total)} Revalidating: {entry['page_url']}")
+    out_path = os.path.join(SAVE_DIR, entry["filename"])
+    with timer.strategy("revalidate") as attempt:
+        try:
+            info = stream_download(scraper.session, entry["pdf_href"], out_path,
+                                   etag=entry["etag"], last_modified=entry["last_modified"])
+        except Throttled:
+            raise
+        except requests.RequestException as e:
+            print(f"[{i}] → revalidation failed:", e)
+            return None
+        if not info:
+            return None
+        attempt.update(ok=True, bytes=info["received"])
+    timer.response(info["ttfb_s"])
+    timer.add("disk_write", info["write_s"])
+    result = new_result(entry["page_url"])
+    result.update(saved=True, path=out_path, pdf_href=entry["pdf_href"], etag=info["etag"],
+                  last_modified=info["last_modified"])
+    if info["not_modified"]:
+        print(f"[{i}] ✓ Unchanged since last run → {out_path}")
+        result.update(strategy=entry["strategy"], size=entry["size"], sha256=entry["sha256"])
+    else:
+        print(f"[{i}] ✓ Updated copy saved → {out_path}")
+        result.update(strategy="http", size=info["size"], sha256=info["sha256"])
+    return result
+
+def fetch_post_page(scraper, url, timer=None):
+    """Like scraper.fetch_page, but errors are raised so the scheduler can tell throttling from a missing link"""
+    print(f"Fetching: {url}")
+    response = scraper.session.get(url, timeout=15)
+    if timer:
+        timer.response(response.elapsed.total_seconds())
+    raise_if_throttled(response)
+    response.raise_for_status()
+    return scraper.parse(response.content)
+
+def fast_path_download(scraper, manifest, url, i, total, timer):
+    """Resolve the PDF href from the static HTML and download it without a browser.
+
+    Returns a result dict on success, None if the URL needs the Playwright fallbacks.
+    HTTP errors fetching the post page are raised for the scheduler to sort out.
+    """
+    print(f"\n{label(i, total)} HTTP: {url}")
+    with timer.time("post_page"):
+        soup = fetch_post_page(scraper, url, timer)
+    with timer.time("link_search"):
+        download_href = scraper.extract_pdf_link(soup, url)
+    if not download_href:
+        print(f"[{i}] → no PDF link in static HTML, leaving it for the browser.")
+        return None
+    reused = reuse_by_href(manifest, url, download_href, i)
+    if reused:
+        return reused
+    fname = make_nice_name(url, os.path.basename(urlparse(download_href).path))
+    out_path = claim_path(manifest, url, os.path.join(SAVE_DIR, fname))
+    with timer.strategy("http") as attempt:
+        try:
+            # stream_download refuses challenge / interstitial pages that come back as 200 text/html
+            info = stream_download(scraper.session, download_href, out_path)
+        except Throttled:
+            raise
+        except requests.RequestException as e:
+            print(f"[{i}] → HTTP fetch failed:", e)
+            return None
+        if not info:
+            print(f"[{i}] → HTTP fetch did not return a PDF, leaving it for the browser.")
+            return None
+        attempt.update(ok=True, bytes=info["received"])
+    timer.response(info["ttfb_s"])
+    timer.add("disk_write", info["write_s"])
+    print(f"[{i}] ✓ Saved PDF over HTTP → {out_path}")
+    result = new_result(url)
+    result.update(saved=True, path=out_path, strategy="http", pdf_href=download_href, size=info["size"],
+                  sha256=info["sha256"], etag=info["etag"], last_modified=info["last_modified"])
+    return result
+
+def manifest_stage(manifest, url, i, total, timer, revalidate=REVALIDATE):
+    """The manifest check every job gets first; no network, so no host slot needed.
+
+    Runs on a worker thread. Returns (result, entry): a result dict if the paper
+    is already done and can be skipped, else None, plus the finished entry to
+    revalidate (None if there is nothing to revalidate).
+    """
+    with timer.time("manifest"):
+        entry = manifest.get(url) if manifest else None
+        done = manifest and manifest.is_done(entry, SAVE_DIR)
+    if not done:
+        return None, None
+    if revalidate and entry["pdf_href"]:
+        return None, entry
+    print(f"{label(i, total)} already downloaded → {entry['filename']}")
+    res = new_result(url)
+    res.update(saved=True, path=os.path.join(SAVE_DIR, entry["filename"]), strategy="manifest",
+               pdf_href=entry["pdf_href"], size=entry["size"], sha256=entry["sha256"],
+               etag=entry["etag"], last_modified=entry["last_modified"])
+    return res, None
+
+def http_stage(scraper, manifest, url, entry, i, total, timer, fast_path=FAST_PATH):
+    """The network part of a job before it needs a browser: revalidation of `entry`, HTTP fast path.
+
+    Runs on a worker thread. Returns a result dict, or None to hand the job to the browser.
+    """
+    if entry:
+        res = revalidate_download(scraper, entry, i, total, timer)
+        if res:
+            return res
+        # a stale href that no longer yields a PDF gets the full treatment again
+    if fast_path:
+        return fast_path_download(scraper, manifest, url, i, total, timer)
+    return None
+
+# --- Per-URL download flow ---
+def make_route_handler(page, blocker=BLOCKER):
+    # first-party host, re-parsed only when the page navigates somewhere else
+    first_party = {"url": None, "host": ""}
 
     # route: abort useless/third-party resources to speed up loading
-    def route_handler(route, request):
+    async def route_handler(route, request):
         url = request.url
         resource = request.resource_type
-        # Abort obvious ad/tracking URLs
-        if looks_like_ad(url):
-            return route.abort()
-        # If it's a third-party image/font/media, abort to speed things up
         req_domain = domain_of(url)
+        # Abort obvious ad/tracking URLs and blocklisted hosts
+        if blocker.is_blocked(url, req_domain):
+            return await route.abort()
+        # If it's a third-party image/font/media, abort to speed things up
+        if page.url != first_party["url"]:
+            first_party["url"] = page.url
+            first_party["host"] = domain_of(page.url)
         # allow same-origin resources but block third-party heavy resources
-        if req_domain and req_domain not in domain_of(page.url):
+        if req_domain and req_domain not in first_party["host"]:
             if resource in ("image", "font", "media"):
-                return route.abort()
+                return await route.abort()
         # let everything else through
-        return route.continue_()
+        return await route.continue_()
+    return route_handler
 
-    # attach route
-    try:
-        page.route("**/*", route_handler)
-    except PlaywrightError:
-        # in case route fails, continue without routing
-        pass
+async def navigate(page, url, i, timing, mode=None, timeout=45_000):
+    """Load `url` in `page`; returns False if the page couldn't be loaded at all.
 
-    for i, url in enumerate(urls, 1):
-        print(f"\n[{i}/{len(urls)}] Visiting: {url}")
+    Fills `timing` with nav_mode, nav_s (until the load condition) and link_s
+    (until a candidate download link existed, None if none showed up).
+    Raises Throttled if the site answered the navigation with 429/503.
+    """
+    mode = mode or NAV_MODE
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    timing["nav_mode"] = mode
+    wait_until = "networkidle" if mode == "networkidle" else "domcontentloaded"
+    try:
+        response = await page.goto(url, wait_until=wait_until, timeout=timeout)
+    except PlaywrightTimeoutError:
+        print(f"{label(i)} → initial navigation timed out — attempting a reload with longer timeout")
         try:
-            page.goto(url, wait_until="networkidle", timeout=45_000)
-        except PlaywrightTimeoutError:
-            print("→ initial navigation timed out — attempting a reload with longer timeout")
-            try:
-                page.reload(timeout=60_000, wait_until="networkidle")
-            except Exception as e:
-                print("→ reload failed:", e)
-                continue
+            response = await page.reload(timeout=60_000, wait_until=wait_until)
         except Exception as e:
-            print("→ navigation error:", e)
-            continue
+            print(f"{label(i)} → reload failed:", e)
+            return False
+    except Exception as e:
+        print(f"{label(i)} → navigation error:", e)
+        return False
+    if response is not None and response.status in THROTTLE_STATUSES:
+        raise Throttled(url, response.status, response.headers.get("retry-after"))
+    timing["nav_s"] = loop.time() - start
 
-        # find candidate download anchors
-        download_href = None
+    if mode == "networkidle":
+        # everything that will ever render is there by now
+        if await page.locator(LINK_SELECTOR).count() > 0:
+            timing["link_s"] = timing["nav_s"]
+        return True
+
+    # ads keep the network busy long after the link is there: stop as soon as one exists
+    try:
+        await page.wait_for_selector(LINK_SELECTOR, state="attached", timeout=LINK_WAIT)
+        timing["link_s"] = loop.time() - start
+    except PlaywrightTimeoutError:
+        print(f"{label(i)} → no download link within {LINK_WAIT / 1000:.0f}s of DOM ready, trying the fallbacks anyway.")
+    return True
+
+def same_document(a, b):
+    """True if two page URLs differ at most in their #fragment"""
+    return a.split("#", 1)[0] == b.split("#", 1)[0]
+
+async def find_download_element(page):
+    """The first download link on the page, or None"""
+    for selector in ('a.wpfd_downloadlink', 'a[href*=".pdf"]'):
+        if await page.locator(selector).count() > 0:
+            return page.locator(selector).first
+    return None
+
+async def process_url(context, page, session, manifest, url, i, total, timer):
+    """Run navigation + the three download strategies for one URL on the given page.
+
+    Returns a result dict (see new_result); stage timings go into `timer`.
+    """
+    result = new_result(url)
+    print(f"\n{label(i, total)} Visiting: {url}")
+    start = time.perf_counter()
+    loaded = await navigate(page, url, i, result)
+    if result["nav_s"] is None:
+        timer.add("navigate", time.perf_counter() - start)
+    else:
+        timer.add("navigate", result["nav_s"])
+        if result["link_s"] is not None:
+            timer.add("link_wait", result["link_s"] - result["nav_s"])
+    if not loaded:
+        return result
+    loaded_url = page.url
+
+    # find candidate download anchors
+    download_href = None
+    with timer.time("link_search"):
         try:
             # first try the known selector
             el = page.locator('a.wpfd_downloadlink[href$=".pdf"]')
-            if el.count() > 0:
-                download_href = el.first.get_attribute("href")
+            if await el.count() > 0:
+                download_href = await el.first.get_attribute("href")
             else:
                 # fallback: any anchor that ends with .pdf
                 anchors = page.locator('a[href*=".pdf"]')
-                if anchors.count() > 0:
+                n_anchors = await anchors.count()
+                if n_anchors > 0:
                     # choose the first one that looks like a direct pdf
-                    for idx in range(anchors.count()):
-                        href = anchors.nth(idx).get_attribute("href")
+                    for idx in range(n_anchors):
+                        href = await anchors.nth(idx).get_attribute("href")
                         if href and href.lower().endswith(".pdf"):
                             download_href = href
                             break
                 # last fallback: look for buttons that may trigger pdf via JS and get their href if present
                 if not download_href:
                     btns = page.locator('a, button')
-                    for idx in range(min(40, btns.count())):
+                    for idx in range(min(40, await btns.count())):
                         try:
-                            href = btns.nth(idx).get_attribute("href")
+                            href = await btns.nth(idx).get_attribute("href")
                             if href and ".pdf" in href.lower():
                                 download_href = href
                                 break
                         except Exception:
                             continue
         except Exception as e:
-            print("→ error searching for links:", e)
-
-        def write_bytes_to_file(bts, path):
-            with open(path, "wb") as f:
-                f.write(bts)
-
-        # Build a nice file name
-        def make_nice_name(base_url, original_name=None):
-            school_match = re.search(r'([a-z0-9\-]+)-physics', base_url, re.I)
-            school = school_match.group(1).replace('-', ' ').title() if school_match else None
-            if original_name:
-                base = original_name
-            else:
-                base = f"{school or 'paper'} - 2023 Grade 13 Physics 1st Term"
-            name = safe_filename(base)
-            if not name.lower().endswith(".pdf"):
-                name += ".pdf"
-            return name
-
-        # If we found a direct href ending with .pdf -> fetch via Playwright request (fast & ad bypass)
-        saved = False
-        if download_href and download_href.lower().endswith(".pdf"):
+            print(f"[{i}] → error searching for links:", e)
+
+    # If we found a direct href ending with .pdf -> fetch via Playwright request (fast & ad bypass)
+    if download_href and download_href.lower().endswith(".pdf"):
+        with timer.strategy("direct") as attempt:
             try:
                 # normalize relative URLs
                 if download_href.startswith("/"):
                     parsed = urlparse(url)
                     download_href = f"{parsed.scheme}://{parsed.hostname}{download_href}"
-                print("→ Found direct PDF href. Fetching directly (no click).")
-                # use the context's request to GET the pdf
-                resp = context.request.get(download_href, timeout=60_000)
-                if resp.status == 200:
-                    content_type = resp.headers.get("content-type", "")
-                    if "pdf" in content_type or download_href.lower().endswith(".pdf"):
-                        body = resp.body()
-                        fname = make_nice_name(url, os.path.basename(download_href))
-                        out_path = os.path.join(SAVE_DIR, fname)
-                        write_bytes_to_file(body, out_path)
-                        print(f"✓ Saved direct PDF → {out_path}")
-                        saved = True
-                    else:
-                        print("→ fetched resource is not a PDF according to Content-Type, will try clicking instead.")
+                print(f"[{i}] → Found direct PDF href. Fetching directly (no click).")
+                reused = reuse_by_href(manifest, url, download_href, i)
+                if reused:
+                    reused.update(nav_mode=result["nav_mode"], nav_s=result["nav_s"], link_s=result["link_s"])
+                    attempt["ok"] = True
+                    return reused
+                # stream the pdf over the pooled session, carrying the browser's cookies
+                cookies = {c["name"]: c["value"] for c in await context.cookies(download_href)}
+                fname = make_nice_name(url, os.path.basename(download_href))
+                out_path = claim_path(manifest, url, os.path.join(SAVE_DIR, fname))
+                info = await asyncio.get_running_loop().run_in_executor(
+                    None, lambda: stream_download(session, download_href, out_path, cookies=cookies))
+                if info:
+                    attempt.update(ok=True, bytes=info["received"])
+                    timer.add("disk_write", info["write_s"])
+                    print(f"[{i}] ✓ Saved direct PDF → {out_path}")
+                    result.update(saved=True, path=out_path, strategy="direct", pdf_href=download_href,
+                                  size=info["size"], sha256=info["sha256"], etag=info["etag"],
+                                  last_modified=info["last_modified"])
                 else:
-                    print(f"→ Direct fetch returned status {resp.status}. Will try clicking.")
+                    print(f"[{i}] → fetched resource is not a PDF, will try clicking instead.")
             except Exception as e:
-                print("→ Direct fetch failed:", e)
+                print(f"[{i}] → Direct fetch failed:", e)
 
-        # If not saved yet, try clicking the download element (but capture the actual PDF response)
-        if not saved:
+    # If not saved yet, try clicking the download element (but capture the actual PDF response)
+    if not result["saved"]:
+        with timer.strategy("click") as attempt:
             try:
-                print("→ Attempting JS-click flow and watching for a PDF response (works if a click streams a PDF).")
+                print(f"[{i}] → Attempting JS-click flow and watching for a PDF response (works if a click streams a PDF).")
                 # try to find any clickable element that likely triggers download
                 click_locator = None
                 try:
-                    if page.locator('a.wpfd_downloadlink').count() > 0:
+                    if await page.locator('a.wpfd_downloadlink').count() > 0:
                         click_locator = page.locator('a.wpfd_downloadlink').first
-                    elif page.locator('a[href*=".pdf"]').count() > 0:
+                    elif await page.locator('a[href*=".pdf"]').count() > 0:
                         click_locator = page.locator('a[href*=".pdf"]').first
                     else:
                         # fallback: any button or link with text "download"
                         cand = page.locator("text=/download/i")
-                        if cand.count() > 0:
+                        if await cand.count() > 0:
                             click_locator = cand.first
                 except Exception:
                     click_locator = None
@@ -211,25 +515,26 @@ with sync_playwright() as p:
                 pdf_response = None
                 try:
                     matcher = lambda r: "content-type" in r.headers and "pdf" in r.headers["content-type"].lower()
-                    with page.expect_response(matcher, timeout=45_000) as resp_info:
+                    async with page.expect_response(matcher, timeout=45_000) as resp_info:
                         if click_locator:
-                            click_locator.click(timeout=20_000)
+                            await click_locator.click(timeout=20_000)
                         else:
                             # if no click locator, try clicking the first anchor to trigger something
                             anchors = page.locator("a")
-                            if anchors.count() > 0:
-                                anchors.first.click(timeout=20_000)
+                            if await anchors.count() > 0:
+                                await anchors.first.click(timeout=20_000)
                             else:
                                 raise RuntimeError("No clickable download element found.")
-                    pdf_response = resp_info.value
+                    pdf_response = await resp_info.value
                 except PlaywrightTimeoutError:
-                    print("→ No PDF response captured within timeout after clicking.")
+                    print(f"[{i}] → No PDF response captured within timeout after clicking.")
                 except Exception as e:
-                    print("→ Clicking attempt raised:", e)
+                    print(f"[{i}] → Clicking attempt raised:", e)
 
                 if pdf_response:
                     try:
-                        body = pdf_response.body()
+                        # the browser has already buffered this response, so it can only be written out whole
+                        body = await pdf_response.body()
                         # attempt to get filename from content-disposition header
                         cd = pdf_response.headers.get("content-disposition", "")
                         fn = None
@@ -240,51 +545,762 @@ with sync_playwright() as p:
                         if not fn:
                             fn = os.path.basename(urlparse(pdf_response.url).path) or None
                         nice = make_nice_name(url, fn)
-                        out_path = os.path.join(SAVE_DIR, nice)
-                        write_bytes_to_file(body, out_path)
-                        print(f"✓ Saved captured PDF response → {out_path}")
-                        saved = True
+                        out_path = claim_path(manifest, url, os.path.join(SAVE_DIR, nice))
+                        sink = DownloadSink(out_path)
+                        sink.write_all(body)
+                        attempt.update(ok=True, bytes=len(body))
+                        timer.add("disk_write", sink.write_s)
+                        print(f"[{i}] ✓ Saved captured PDF response → {out_path}")
+                        result.update(saved=True, path=out_path, strategy="click", pdf_href=pdf_response.url,
+                                      size=len(body), sha256=sink.sha256, etag=pdf_response.headers.get("etag"),
+                                      last_modified=pdf_response.headers.get("last-modified"))
                     except Exception as e:
-                        print("→ failed to save captured PDF:", e)
+                        print(f"[{i}] → failed to save captured PDF:", e)
 
             except Exception as outer_e:
-                print("→ Download-by-click flow failed:", outer_e)
+                print(f"[{i}] → Download-by-click flow failed:", outer_e)
 
-        if not saved:
-            print("→ Couldn't get the PDF automatically. Trying a last-resort approach (open in new tab and wait for download).")
+    if not result["saved"]:
+        print(f"[{i}] → Couldn't get the PDF automatically. Trying a last-resort approach (click and wait for a download).")
+        with timer.strategy("download_event") as attempt:
             try:
-                # open a new page and click with expect_download (handles real download events)
-                newp = context.new_page()
-                newp.goto(url, wait_until="networkidle", timeout=30_000)
-                el = None
-                if newp.locator('a.wpfd_downloadlink').count() > 0:
-                    el = newp.locator('a.wpfd_downloadlink').first
-                elif newp.locator('a[href*=".pdf"]').count() > 0:
-                    el = newp.locator('a[href*=".pdf"]').first
+                # the post is normally still loaded: only navigate again if the click flow took the page elsewhere
+                el = await find_download_element(page) if same_document(page.url, loaded_url) else None
+                if el is None:
+                    with timer.time("renavigate"):
+                        await navigate(page, url, i, {}, timeout=30_000)
+                    el = await find_download_element(page)
 
                 if el:
                     try:
-                        with newp.expect_download(timeout=60_000) as dl_info:
-                            el.click()
-                        dl = dl_info.value
+                        async with page.expect_download(timeout=60_000) as dl_info:
+                            await el.click()
+                        dl = await dl_info.value
                         suggested = dl.suggested_filename or f"paper_{i}.pdf"
                         fname = make_nice_name(url, suggested)
-                        out_path = os.path.join(SAVE_DIR, fname)
-                        dl.save_as(out_path)
-                        print(f"✓ Downloaded via download event → {out_path}")
-                        saved = True
+                        out_path = claim_path(manifest, url, os.path.join(SAVE_DIR, fname))
+                        sink = DownloadSink(out_path)
+                        with timer.time("disk_write"):
+                            await dl.save_as(sink.part_path)
+                            sink.commit()
+                        size, sha256 = file_digest(out_path)
+                        attempt.update(ok=True, bytes=size)
+                        print(f"[{i}] ✓ Downloaded via download event → {out_path}")
+                        result.update(saved=True, path=out_path, strategy="download_event", pdf_href=dl.url,
+                                      size=size, sha256=sha256)
                     except PlaywrightTimeoutError:
-                        print("→ download event timed out.")
-                newp.close()
+                        print(f"[{i}] → download event timed out.")
+            except Throttled:
+                raise   # the worker backs off and retries
             except Exception as e:
-                print("→ last-resort approach failed:", e)
+                print(f"[{i}] → last-resort approach failed:", e)
+
+    return result
+
+# --- Worker pool ---
+class RunState:
+    """What every stage of one run shares"""
+
+    def __init__(self, session, manifest, total=None, per_host=PER_HOST_LIMIT, timing_log=None, host_shares=1):
+        self.session = session
+        self.manifest = manifest
+        self.total = total
+        self.results = {}
+        # a POLITE_DELAY under the scheduler's floor (0 for a local benchmark server) lowers the floor too;
+        # with `host_shares` processes pacing the same hosts, each spaces its requests that much wider
+        self.scheduler = HostScheduler(per_host, POLITE_DELAY * host_shares,
+                                       min_delay=min(MIN_DELAY, POLITE_DELAY) * host_shares)
+        self.retries = RetryTracker()
+        self.timings = TimingLog(timing_log)
+        self.stop = threading.Event()   # set by Ctrl+C: finish what's in flight, start nothing new
+        self.stopped_early = False
+
+    def request_stop(self):
+        self.stopped_early = True
+        self.stop.set()
+        self.retries.cancel_pending()
 
-        # small polite delay but keep it short
-        time.sleep(1.1)
+    def finish(self, i, result, stage=None, error=None, status=None, timer=None):
+        self.results[i] = result
+        if timer:
+            with timer.time("finish"):
+                finish_result(self.manifest, result)
+        else:
+            finish_result(self.manifest, result)
+        if result["saved"]:
+            self.retries.succeed(result["url"])
+        else:
+            self.retries.fail(result["url"], stage, error, status)
+
+class PagePool:
+    """Browser pages opened ahead of need, each with the route handler already attached.
+
+    Every worker takes one page for the whole run; `spare` more stay open so a
+    page that crashed or got closed is replaced without waiting for a new one.
+    """
+
+    def __init__(self, context, spare=SPARE_PAGES):
+        self.context = context
+        self.spare = spare
+        self.idle = []
+        self._refill = None
+
+    async def open_page(self):
+        page = await self.context.new_page()
+        page.set_default_timeout(30_000)  # safer default
+        # attach route
+        try:
+            await page.route("**/*", make_route_handler(page))
+        except PlaywrightError:
+            # in case route fails, continue without routing
+            pass
+        return page
+
+    async def fill(self, count):
+        """Open pages concurrently until `count` are idle"""
+        opened = await asyncio.gather(*(self.open_page() for _ in range(count - len(self.idle))),
+                                      return_exceptions=True)
+        self.idle.extend(p for p in opened if not isinstance(p, BaseException))
+
+    async def get(self):
+        page = None
+        while self.idle and page is None:
+            candidate = self.idle.pop()
+            page = None if candidate.is_closed() else candidate
+        if page is None:
+            page = await self.open_page()
+        if len(self.idle) < self.spare and (self._refill is None or self._refill.done()):
+            self._refill = asyncio.create_task(self.fill(self.spare))
+        return page
+
+    async def close(self):
+        if self._refill is not None:
+            await asyncio.gather(self._refill, return_exceptions=True)
+        for page in self.idle:
+            try:
+                await page.close()
+            except Exception:
+                pass
+        self.idle = []
+
+async def worker(pool, run, queue):
+    """One page per worker (from the pool); pulls (index, url) jobs until it gets the None sentinel."""
+    context = pool.context
+    page = await pool.get()
+
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await queue.get()
+        if job is None:
+            break
+        i, url = job
+        if run.stop.is_set():
+            queue.task_done()
+            continue
+        requeued = False
+        try:
+            if page.is_closed():
+                print(f"{label(i)} → page was closed (crashed?), taking a fresh one")
+                page = await pool.get()
+            attempt = run.retries.attempt("browser", url)
+            timer = UrlTimer(i, url, "browser", attempt)
+            error, retry_after = None, None
+            waited = loop.time()
+            async with run.scheduler.slot(url):
+                start = loop.time()
+                timer.add("host_wait", start - waited)
+                try:
+                    res = await process_url(context, page, run.session, run.manifest, url, i, run.total, timer)
+                except Throttled as e:
+                    print(f"{label(i)} → {e}")
+                    res, error, retry_after = new_result(url), e, retry_after_seconds(e.retry_after)
+                except Exception as e:
+                    print(f"{label(i)} → worker error:", e)
+                    res, error = new_result(url), e
+                if isinstance(error, Throttled):
+                    run.scheduler.report(url, False, retry_after=retry_after)
+                else:
+                    # the host did its part if the page loaded, PDF or not; link waits and download
+                    # timeouts say nothing about its latency, so only a DOM-ready load time is reported
+                    answered = error is None and res["nav_s"] is not None
+                    run.scheduler.report(url, answered, res["nav_s"] if res["nav_mode"] == "link" else None)
+
+            # a page that loaded without yielding a PDF will do the same next time; only
+            # failed navigations, worker errors and throttling are worth another attempt
+            retryable = error is not None or res["nav_s"] is None
+            if res["saved"] or not retryable or not run.retries.can_retry("browser", url) or run.stop.is_set():
+                run.finish(i, res, "browser", error or "no PDF found", getattr(error, "status", None), timer=timer)
+                run.timings.write(timer, res, error)
+            else:
+                delay = run.retries.retry_later(queue, job, "browser", url, retry_after)
+                requeued = True
+                run.timings.write(timer, res, error, next_step="retry")
+                print(f"{label(i)} → attempt {attempt} failed, retrying in {delay:.0f}s")
+        except Exception as e:
+            print(f"{label(i)} → worker error:", e)
+        finally:
+            if not requeued:
+                queue.task_done()
 
     try:
-        browser.close()
+        await page.close()
     except Exception:
         pass
 
-print("\nAll done. Check folder:", SAVE_DIR)
+class BrowserStage:
+    """Chromium side of the pipeline: launched on the first job that needs it
+    (or right away, see warm), then `concurrency` page workers drain its queue.
+
+    With a `profile_dir` Chromium runs on a persistent profile, so cookies and
+    site storage carry over from earlier runs.
+    """
+
+    def __init__(self, run, concurrency=CONCURRENCY, profile_dir=None):
+        self.run = run
+        self.concurrency = concurrency
+        self.profile_dir = profile_dir
+        self.queue = None
+        self.error = None
+        self._start_lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._pool = None
+        self._warming = None
+        self._workers = []
+
+    async def _start(self):
+        start = time.perf_counter()
+        self._playwright = await async_playwright().start()
+        # the HTTP session's UA: cookies the browser earns (e.g. challenge clearance) stay valid for direct fetches
+        user_agent = USER_AGENT
+        args = ["--no-sandbox", "--disable-dev-shm-usage"]
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            self._context = await self._playwright.chromium.launch_persistent_context(
+                self.profile_dir, headless=HEADLESS, args=args, user_agent=user_agent)
+        else:
+            self._browser = await self._playwright.chromium.launch(headless=HEADLESS, args=args)
+            # set a context; accept_downloads not required because we do direct fetch where possible
+            self._context = await self._browser.new_context(user_agent=user_agent)
+        self._pool = PagePool(self._context)
+        await self._pool.fill(self.concurrency + self._pool.spare)
+        self.queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(worker(self._pool, self.run, self.queue)) for _ in range(self.concurrency)]
+        print(f"→ Chromium ready with {self.concurrency} pages in {time.perf_counter() - start:.1f}s")
+
+    async def _ensure_started(self):
+        async with self._start_lock:
+            if self.queue is None and self.error is None:
+                if self.profile_dir:
+                    print(f"\n→ Starting Chromium on the saved profile in {self.profile_dir}.")
+                else:
+                    print("\n→ Starting Chromium for URLs the HTTP fast path couldn't handle.")
+                try:
+                    await self._start()
+                except Exception as e:
+                    print("→ couldn't start Chromium:", e)
+                    self.error = e
+
+    def warm(self):
+        """Start Chromium and its pages in the background now, while the HTTP stage works"""
+        self._warming = asyncio.create_task(self._ensure_started())
+
+    async def submit(self, job):
+        await self._ensure_started()
+        if self.error is not None:
+            i, url = job
+            self.run.finish(i, new_result(url), "browser", self.error)
+            return
+        await self.queue.put(job)
+
+    async def join(self):
+        """Wait until every submitted job, retries included, is finished"""
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def close(self):
+        if self._warming is not None:
+            await asyncio.gather(self._warming, return_exceptions=True)
+        if not self._workers:
+            if self._playwright:   # started, but Chromium didn't launch
+                await self._playwright.stop()
+            return
+        for _ in self._workers:
+            await self.queue.put(None)
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await self._pool.close()
+        try:
+            # closing the context is what writes a persistent profile back to disk
+            await self._context.close()
+            if self._browser:
+                await self._browser.close()
+        except Exception:
+            pass
+        await self._playwright.stop()
+
+# --- Pipeline ---
+async def produce(source, queue, stop, indexed=False):
+    """Feed (index, url) jobs from a (possibly blocking, possibly endless) iterable into
+    the bounded queue; the discovery thread waits whenever the queue is full.
+
+    `source` yields URLs, or (index, url) pairs if `indexed`. Feeding ends early once `stop` is set;
+    either way a source with a close() method (a generator) is closed on the discovery thread.
+    """
+    loop = asyncio.get_running_loop()
+
+    def pump():
+        try:
+            for job in (source if indexed else enumerate(source, 1)):
+                if stop.is_set():
+                    return
+                put = asyncio.run_coroutine_threadsafe(queue.put(tuple(job)), loop)
+                while True:
+                    try:
+                        put.result(timeout=0.5)
+                        break
+                    except FutureTimeoutError:
+                        # don't outlive an aborted run waiting on a queue nobody drains
+                        if stop.is_set():
+                            put.cancel()
+                            return
+        finally:
+            # a generator source stops crawling and closes its exports/catalog now, not at exit
+            close = getattr(source, "close", None)
+            if close:
+                close()
+
+    await loop.run_in_executor(None, pump)
+
+def is_transient(error):
+    """Network hiccups and 5xx answers are worth another try over HTTP"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.HTTPError) and response is not None and response.status_code >= 500
+
+async def http_worker(run, queue, pool, scraper, browser, revalidate, fast_path):
+    """Pulls (index, url) jobs until cancelled; hands what HTTP can't do to the browser stage."""
+    while True:
+        i, url = job = await queue.get()
+        if run.stop.is_set():
+            queue.task_done()
+            continue
+        requeued = False
+        try:
+            requeued = await http_job(run, queue, job, pool, scraper, browser, revalidate, fast_path)
+        except Exception as e:
+            print(f"{label(i)} → HTTP worker error:", e)
+            run.finish(i, new_result(url), "http", e)
+        finally:
+            if not requeued:
+                queue.task_done()
+
+async def http_job(run, queue, job, pool, scraper, browser, revalidate, fast_path):
+    """Run one job through the HTTP stage; returns True if it was put back for a retry."""
+    loop = asyncio.get_running_loop()
+    i, url = job
+    attempt = run.retries.attempt("http", url)
+    timer = UrlTimer(i, url, "http", attempt)
+    res, retry_after, error = None, None, None
+    try:
+        res, entry = await loop.run_in_executor(pool, manifest_stage, run.manifest, url, i, run.total, timer,
+                                                revalidate)
+    except Exception as e:
+        print(f"{label(i)} → manifest error:", e)
+        res, entry = None, None
+    # only jobs that are about to hit the network wait for the host's spacing
+    if res is None and (entry or fast_path):
+        waited = loop.time()
+        async with run.scheduler.slot(url):
+            start = loop.time()
+            timer.add("host_wait", start - waited)
+            try:
+                res = await loop.run_in_executor(pool, http_stage, scraper, run.manifest, url, entry, i, run.total,
+                                                 timer, fast_path)
+                # pace on how fast the host answers, not on how long the PDF took to stream
+                run.scheduler.report(url, True, timer.latency())
+            except Throttled as e:
+                error, retry_after = e, retry_after_seconds(e.retry_after)
+                run.scheduler.report(url, False, retry_after=retry_after)
+            except Exception as e:
+                print(f"{label(i)} → HTTP stage error:", e)
+                error = e
+                # only connection errors, timeouts and 5xx count against the host
+                run.scheduler.report(url, not is_transient(e), timer.latency())
+
+    if res:
+        run.results[i] = res
+        if res["strategy"] != "manifest":
+            run.finish(i, res, timer=timer)
+        run.timings.write(timer, res)
+    elif isinstance(error, Throttled) or (error is not None and is_transient(error)):
+        if run.retries.can_retry("http", url) and not run.stop.is_set():
+            delay = run.retries.retry_later(queue, job, "http", url, retry_after)
+            run.timings.write(timer, error=error, next_step="retry")
+            print(f"{label(i)} → {error} — attempt {attempt}, retrying in {delay:.0f}s")
+            return True
+        if isinstance(error, Throttled):
+            # the browser would only be throttled too
+            res = new_result(url)
+            run.finish(i, res, "http", error, error.status, timer=timer)
+            run.timings.write(timer, res, error)
+        else:
+            run.timings.write(timer, error=error, next_step="browser")
+            await browser.submit(job)
+    else:
+        run.timings.write(timer, error=error, next_step="browser")
+        await browser.submit(job)
+    return False
+
+def index_save_dir(manifest):
+    hashed = manifest.index_dir(SAVE_DIR, file_digest)
+    if hashed:
+        print(f"→ indexed {hashed} new PDFs in {SAVE_DIR} for duplicate detection")
+
+def install_stop_handler(run):
+    """First Ctrl+C: stop taking new URLs and let in-flight ones finish. Second: abort them too."""
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+
+    def on_sigint():
+        if run.stop.is_set():
+            print("\n→ Ctrl+C again — aborting in-flight downloads.")
+            task.cancel()
+        else:
+            print("\n→ Ctrl+C — finishing in-flight downloads, then stopping (Ctrl+C again to abort).")
+            run.request_stop()
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, on_sigint)
+    except (NotImplementedError, RuntimeError):
+        # no loop signal handlers here (Windows, or not the main thread): Ctrl+C raises as usual
+        return lambda: None
+    return lambda: loop.remove_signal_handler(signal.SIGINT)
+
+async def execute_pipeline(source, total=None, concurrency=CONCURRENCY, per_host=PER_HOST_LIMIT, fast_path=FAST_PATH,
+                           manifest_path=MANIFEST_PATH, revalidate=REVALIDATE, queue_size=QUEUE_SIZE,
+                           timing_log=TIMING_LOG, warm_start=WARM_START, profile_dir=BROWSER_PROFILE,
+                           host_shares=1, indexed=False, index_files=True):
+    """Run the pipeline over `source` and return its RunState, without reporting (see run_pipeline)"""
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    scraper = make_http_scraper(concurrency)
+    manifest = Manifest(manifest_path) if manifest_path else None
+    if manifest and index_files:
+        index_save_dir(manifest)
+    run = RunState(scraper.session, manifest, total, per_host, timing_log, host_shares)
+    queue = asyncio.Queue(maxsize=queue_size)
+    browser = BrowserStage(run, concurrency, profile_dir if warm_start else None)
+    if warm_start:
+        browser.warm()
+    remove_stop_handler = install_stop_handler(run)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            workers = [asyncio.create_task(http_worker(run, queue, pool, scraper, browser, revalidate, fast_path))
+                       for _ in range(concurrency)]
+            try:
+                await produce(source, queue, run.stop, indexed)
+                await queue.join()
+                await browser.join()
+            finally:
+                # every job is finished (or we're bailing out): the idle HTTP workers can go
+                run.stop.set()
+                for w in workers:
+                    w.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                await browser.close()
+    finally:
+        remove_stop_handler()
+        run.timings.close()
+        if manifest:
+            manifest.close()
+    return run
+
+def report_run(records, wall_s, failures, hosts, stopped=False):
+    """Print the timing summary and write FAILURE_REPORT"""
+    print_summary(summarize(records, wall_s))
+    failures = sorted(failures, key=lambda f: f["url"])
+    with open(FAILURE_REPORT, "w", encoding="utf-8") as f:
+        json.dump({"failures": failures, "hosts": hosts}, f, indent=2)
+    if failures:
+        print(f"\n→ {len(failures)} URLs failed; details in {FAILURE_REPORT}")
+    if stopped:
+        print("\n→ Stopped early on Ctrl+C; run again to pick up the remaining URLs.")
+
+async def run_pipeline(source, total=None, **options):
+    """Stream URLs from `source` through manifest check → HTTP fast path → browser fallbacks.
+
+    Downloads start as soon as the first URL arrives, so `source` can be a live
+    discovery generator. Failed URLs are retried with backoff within their stage
+    and whatever still fails ends up in FAILURE_REPORT. Every attempt's stage
+    timings are appended to `timing_log` and summarised at the end. Ctrl+C
+    stops cleanly (see install_stop_handler). Returns the per-URL result dicts
+    in arrival order. Options are those of execute_pipeline.
+    """
+    run = await execute_pipeline(source, total, **options)
+    report_run(run.timings.records, run.timings.elapsed(), run.retries.failures.values(),
+               run.scheduler.summary(), stopped=run.stopped_early)
+    return [run.results[i] for i in sorted(run.results)]
+
+async def download_all(urls, **kwargs):
+    """Download a fixed list of page URLs (see run_pipeline for options)."""
+    return await run_pipeline(urls, total=len(urls), **kwargs)
+
+# --- Sharded mode ---
+# settings a shard copies from the parent (spawned processes re-import this module with its defaults)
+SHARD_SETTINGS = ("HEADLESS", "SAVE_DIR", "POLITE_DELAY", "FAILURE_REPORT", "LINK_DUPLICATES", "NAV_MODE", "LINK_WAIT",
+                  "BROWSER_PROFILE")
+
+def shard_main(shard, jobs, results, halt, settings, options):
+    """One shard process: its own Chromium, pages and route handlers, fed from the shared job queue"""
+    globals().update(settings)
+    if options.get("warm_start"):
+        # Chromium won't share a profile between two browsers: each shard keeps its own
+        options = dict(options, profile_dir=f"{options.get('profile_dir') or BROWSER_PROFILE}-shard{shard}")
+
+    def next_jobs():
+        while True:
+            try:
+                job = jobs.get(timeout=0.5)
+            except queue_mod.Empty:
+                if halt.is_set():   # the parent stopped feeding (Ctrl+C) and may never send the sentinel
+                    return
+                continue
+            if job is None:
+                return
+            yield job
+
+    try:
+        run = asyncio.run(execute_pipeline(next_jobs(), indexed=True, index_files=False, **options))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        results.put((shard, None))  # aborted by a second Ctrl+C
+        return
+    except BaseException:
+        results.put((shard, None))
+        raise
+    results.put((shard, {
+        "results": sorted(run.results.items()),
+        "failures": list(run.retries.failures.values()),
+        "hosts": run.scheduler.summary(),
+        "records": run.timings.records,
+        "stopped": run.stopped_early,
+    }))
+
+def run_sharded(source, processes=PROCESSES, total=None, per_host=PER_HOST_LIMIT, manifest_path=MANIFEST_PATH,
+                queue_size=QUEUE_SIZE, **options):
+    """run_pipeline spread over `processes` worker processes, each running its own browser.
+
+    This process feeds one shared job queue, so every URL goes to exactly one shard
+    (repeats in `source` are dropped). The shards share the manifest, which also
+    hands out save-file names, and append to the same timing log.
+
+    Each shard paces hosts on its own, so the host budget is divided up front:
+    there are at most `per_host` shards, each with `per_host // processes` slots
+    per host and request spacing `processes` times wider. Together they keep no
+    more requests in flight, and start them no faster, than one process would.
+    A throttle (429/503) slows only the shard that got it.
+    Returns the per-URL result dicts in arrival order.
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes > per_host:
+        print(f"→ {processes} shards would exceed {per_host} requests per host; using {per_host} (raise --per-host for more)")
+        processes = per_host
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    if manifest_path:
+        manifest = Manifest(manifest_path)
+        index_save_dir(manifest)
+        manifest.close()
+    options.update(total=total, per_host=per_host // processes, host_shares=processes,
+                   manifest_path=manifest_path, queue_size=queue_size)
+
+    # spawn, not fork: the shards start Playwright and threads of their own
+    ctx = multiprocessing.get_context("spawn")
+    jobs = ctx.Queue(maxsize=queue_size)
+    results = ctx.Queue()
+    halt = ctx.Event()
+    settings = {name: globals()[name] for name in SHARD_SETTINGS}
+    shards = [ctx.Process(target=shard_main, args=(k, jobs, results, halt, settings, options), name=f"shard-{k}")
+              for k in range(processes)]
+    for p in shards:
+        p.start()
+    print(f"→ {processes} shard processes, {options.get('concurrency', CONCURRENCY)} pages each")
+
+    stop = threading.Event()
+
+    def on_sigint(sig, frame):
+        # the shards get the same Ctrl+C and wind down (or abort) on their own; this process stops feeding
+        if not stop.is_set():
+            print("\n→ Ctrl+C — no more URLs for the shards; waiting for them to finish (Ctrl+C again to abort).")
+        stop.set()
+
+    previous = signal.signal(signal.SIGINT, on_sigint)
+    start = time.perf_counter()
+    seen = set()
+    outputs = {}
+    try:
+        for i, url in enumerate(source, 1):
+            if stop.is_set():
+                break
+            if url in seen:
+                continue
+            seen.add(url)
+            while not stop.is_set():
+                try:
+                    jobs.put((i, url), timeout=0.5)
+                    break
+                except queue_mod.Full:
+                    if not any(p.is_alive() for p in shards):
+                        print("→ all shard processes have exited; stopping.")
+                        stop.set()
+    finally:
+        if stop.is_set():
+            halt.set()
+        # one sentinel per shard; the queue can still be full of jobs, so keep trying while anyone reads it
+        sentinels = len(shards)
+        while sentinels and any(p.is_alive() for p in shards):
+            try:
+                jobs.put(None, timeout=0.5)
+                sentinels -= 1
+            except queue_mod.Full:
+                pass
+        while len(outputs) < len(shards):
+            try:
+                shard, out = results.get(timeout=1)
+                outputs[shard] = out
+            except queue_mod.Empty:
+                if not any(p.is_alive() for p in shards):
+                    break
+        for p in shards:
+            p.join()
+        jobs.cancel_join_thread()
+        signal.signal(signal.SIGINT, previous)
+
+    done = [out for out in outputs.values() if out]
+    if len(done) < len(shards):
+        print(f"→ {len(shards) - len(done)} shard(s) exited without results")
+    report_run([r for out in done for r in out["records"]], time.perf_counter() - start,
+               [f for out in done for f in out["failures"]],
+               {f"shard-{k}": out["hosts"] for k, out in sorted(outputs.items()) if out},
+               stopped=stop.is_set() or any(out["stopped"] for out in done))
+    return [r for _, r in sorted(pair for out in done for pair in out["results"])]
+
+def discover_urls(category_urls, year=None, paper_type=None, max_workers=CONCURRENCY, export_paths=(), export_mode="w",
+                  catalog_path=None):
+    """Yield paper page URLs from every page of the given categories, filtered as they arrive.
+
+    Papers that pass the filters are also written to each of `export_paths`
+    (.ndjson/.jsonl/.csv) as they are found; every paper found is added to the
+    catalog at `catalog_path`, if given.
+    """
+    scraper = PastPapersWikiScraper(category_urls[0], max_workers=max_workers)
+    writers = [PaperWriter(path, export_mode) for path in export_paths]
+    catalog = Catalog(catalog_path) if catalog_path else None
+    try:
+        for paper in scraper.iter_papers(category_urls):
+            if catalog:
+                catalog.add([paper])
+            if year and not scraper.matches_year(paper, year):
+                continue
+            if paper_type and not scraper.matches_type(paper, paper_type):
+                continue
+            for writer in writers:
+                writer.write(paper)
+            yield paper["url"]
+    finally:
+        for writer in writers:
+            writer.close()
+        if catalog:
+            catalog.close()
+
+def catalog_urls(catalog_path, year=None, paper_type=None, search=None):
+    """Page URLs of the catalogued papers matching the filters (an indexed query, no crawling)"""
+    with Catalog(catalog_path) as catalog:
+        # a type that names a kind outright uses the kind index; anything narrower must be in the title
+        kind = normalize_kind(paper_type)
+        phrase = paper_type if paper_type and not kind else None
+        papers = catalog.query(search, phrase=phrase, year=year, kind=kind)
+    print(f"→ {len(papers)} papers in {catalog_path} match")
+    return [p["url"] for p in papers]
+
+def print_wait_report(results):
+    """How long each navigation mode took to load pages and to produce a download link"""
+    by_mode = {}
+    for r in results:
+        if r["nav_mode"]:
+            by_mode.setdefault(r["nav_mode"], []).append(r)
+    for mode, rs in by_mode.items():
+        loads = [r["nav_s"] for r in rs if r["nav_s"] is not None]
+        links = [r["link_s"] for r in rs if r["link_s"] is not None]
+        print(f"\n→ {mode}: {len(rs)} pages, link found on {len(links)}")
+        if loads:
+            print(f"   page load     median {statistics.median(loads):6.2f}s  max {max(loads):6.2f}s  total {sum(loads):7.1f}s")
+        if links:
+            print(f"   time-to-link  median {statistics.median(links):6.2f}s  max {max(links):6.2f}s  total {sum(links):7.1f}s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download past-paper PDFs from pastpapers.wiki.")
+    parser.add_argument("--category", action="append", default=[],
+                        help="category URL to discover papers from (repeatable); without it the built-in `urls` list is used")
+    parser.add_argument("--year", help="only papers whose title contains this year")
+    parser.add_argument("--type", dest="paper_type", help="only papers whose title contains this type, e.g. 'Marking Scheme'")
+    parser.add_argument("--export", action="append", default=[], metavar="PATH",
+                        help="with --category: also write discovered papers to this .ndjson/.csv file as they arrive (repeatable)")
+    parser.add_argument("--export-mode", choices=EXPORT_MODES, default="w",
+                        help="w: new file; append: only papers not in the file yet; merge: also re-add papers that changed")
+    parser.add_argument("--catalog", metavar="PATH",
+                        help="SQLite catalog: with --category, add every discovered paper to it; "
+                             "without, download the catalogued papers matching --year/--type/--search")
+    parser.add_argument("--search", help="with --catalog and no --category: full-text search over the catalog")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="pages (and HTTP workers) per process")
+    parser.add_argument("--processes", type=int, default=PROCESSES,
+                        help="shard the URLs over this many processes, each with its own Chromium "
+                             "(0 = one per CPU core). The shards share --per-host, so there are never more "
+                             "of them than that: raise --per-host too to use more cores on one site")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_LIMIT, metavar="N",
+                        help="pages and downloads in flight per host across all processes (default %(default)s)")
+    parser.add_argument("--warm-start", action="store_true", default=WARM_START,
+                        help="start Chromium on a saved profile (cookies, site storage) as the run begins, pages ready")
+    parser.add_argument("--profile", default=BROWSER_PROFILE, metavar="DIR",
+                        help="Chromium profile folder for --warm-start (one per shard with --processes)")
+    parser.add_argument("--revalidate", action="store_true", default=REVALIDATE,
+                        help="re-check already downloaded papers with a conditional GET")
+    parser.add_argument("--nav-mode", choices=("link", "networkidle"), default=NAV_MODE,
+                        help="wait for the first download link (default) or for the network to go idle")
+    parser.add_argument("--no-fast-path", dest="fast_path", action="store_false", default=FAST_PATH,
+                        help="skip the plain-HTTP stage and send every URL to the browser")
+    args = parser.parse_args()
+    if args.per_host < 1:
+        parser.error("--per-host must be at least 1")
+    return args
+
+# --- Main script ---
+if __name__ == "__main__":
+    args = parse_args()
+    NAV_MODE = args.nav_mode
+    options = dict(concurrency=args.concurrency, per_host=args.per_host, revalidate=args.revalidate,
+                   fast_path=args.fast_path, warm_start=args.warm_start, profile_dir=args.profile)
+    if args.category:
+        source, total = discover_urls(args.category, args.year, args.paper_type, max_workers=args.concurrency,
+                                      export_paths=args.export, export_mode=args.export_mode,
+                                      catalog_path=args.catalog), None
+    elif args.catalog:
+        source = catalog_urls(args.catalog, args.year, args.paper_type, args.search)
+        total = len(source)
+    else:
+        source, total = urls, len(urls)
+    try:
+        if args.processes != 1:
+            results = run_sharded(source, args.processes, total, **options)
+        else:
+            results = asyncio.run(run_pipeline(source, total, **options))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\n→ Aborted; finished papers are in the manifest, run again to resume.")
+        raise SystemExit(130)
+    ok = sum(1 for r in results if r["saved"])
+    print(f"\nSaved {ok}/{len(results)} papers.")
+    for r in results:
+        if not r["saved"]:
+            print("✗ failed:", r["url"])
+    print_wait_report(results)
+    print("\nAll done. Check folder:", SAVE_DIR)
@@ -0,0 +1,152 @@
+import os
+import glob
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    page_url      TEXT PRIMARY KEY,
+    pdf_href      TEXT,
+    filename      TEXT,
+    size          INTEGER,
+    sha256        TEXT,
+    etag          TEXT,
+    last_modified TEXT,
+    strategy      TEXT,
+    status        TEXT NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS downloads_pdf_href ON downloads (pdf_href);
+
+-- content index of the PDFs in the save directory
+CREATE TABLE IF NOT EXISTS files (
+    filename TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    sha256   TEXT NOT NULL,
+    mtime    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+
+-- which page a save-path name belongs to, so processes sharing the manifest never write the same file
+CREATE TABLE IF NOT EXISTS file_claims (
+    filename TEXT PRIMARY KEY,
+    page_url TEXT NOT NULL
+);
+"""
+
+FIELDS = ("pdf_href", "filename", "size", "sha256", "etag", "last_modified", "strategy", "status")
+
+
+class Manifest:
+    """On-disk record of page URL → PDF href → saved file, so reruns can skip finished papers"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+
+    def get(self, page_url):
+        """Return the stored entry for a page URL as a dict (None if never seen)"""
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM downloads WHERE page_url = ?", (page_url,)).fetchone()
+        return dict(row) if row else None
+
+    def is_done(self, entry, save_dir):
+        """True if the entry finished and its file is still on disk with the recorded size"""
+        if not entry or entry["status"] != "done" or not entry["filename"]:
+            return False
+        path = os.path.join(save_dir, entry["filename"])
+        return os.path.exists(path) and os.path.getsize(path) == entry["size"]
+
+    def record(self, page_url, **fields):
+        """Insert or update the entry for a page URL; unspecified fields keep their stored value"""
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown manifest fields: {', '.join(sorted(unknown))}")
+        current = self.get(page_url) or {}
+        row = {f: fields.get(f, current.get(f)) for f in FIELDS}
+        row["status"] = row["status"] or "pending"
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO downloads (page_url, {', '.join(FIELDS)}, updated_at) "
+                f"VALUES (?, {', '.join('?' for _ in FIELDS)}, ?)",
+                (page_url, *(row[f] for f in FIELDS), time.time()),
+            )
+
+    def done_for_href(self, pdf_href, save_dir, exclude_page=None):
+        """A finished entry (from another page) that already saved this PDF href, if its file is still there"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM downloads WHERE pdf_href = ? AND status = 'done' AND page_url != ?",
+                (pdf_href, exclude_page or ""),
+            ).fetchall()
+        for row in map(dict, rows):
+            if self.is_done(row, save_dir):
+                return row
+        return None
+
+    def owned_by_other(self, filename, page_url):
+        """True if a different page's finished download lives in this file"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM downloads WHERE filename = ? AND status = 'done' AND page_url != ? LIMIT 1",
+                (filename, page_url),
+            ).fetchone()
+        return row is not None
+
+    def claim_file(self, filename, page_url):
+        """Reserve a file name for a page; True if it is (now) this page's, False if another page has it"""
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO file_claims VALUES (?, ?)", (filename, page_url))
+            row = self.conn.execute("SELECT page_url FROM file_claims WHERE filename = ?", (filename,)).fetchone()
+        return row[0] == page_url
+
+    def add_file(self, filename, size, sha256, mtime):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (filename, size, sha256, mtime))
+
+    def file_with_hash(self, sha256, save_dir, exclude=None):
+        """Name of a file in save_dir with these exact contents (other than `exclude`), or None"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT filename, size FROM files WHERE sha256 = ? AND filename != ?", (sha256, exclude or "")
+            ).fetchall()
+        for filename, size in rows:
+            path = os.path.join(save_dir, filename)
+            if os.path.exists(path) and os.path.getsize(path) == size:
+                return filename
+        return None
+
+    def index_dir(self, save_dir, digest):
+        """Bring the files table up to date with the PDFs in save_dir.
+
+        Only new or changed files (by size and mtime) are hashed, with `digest(path) -> (size, sha256)`.
+        Returns the number of files hashed.
+        """
+        with self._lock:
+            known = {r[0]: (r[1], r[2]) for r in self.conn.execute("SELECT filename, size, mtime FROM files")}
+        on_disk = set()
+        hashed = 0
+        for path in glob.glob(os.path.join(glob.escape(save_dir), "*.pdf")):
+            name = os.path.basename(path)
+            on_disk.add(name)
+            st = os.stat(path)
+            if known.get(name) == (st.st_size, st.st_mtime):
+                continue
+            size, sha256 = digest(path)
+            self.add_file(name, size, sha256, st.st_mtime)
+            hashed += 1
+        gone = set(known) - on_disk
+        if gone:
+            with self._lock, self.conn:
+                self.conn.executemany("DELETE FROM files WHERE filename = ?", [(n,) for n in gone])
+        return hashed
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,156 @@
+import asyncio
+import contextlib
+import random
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+MIN_DELAY = 0.2       # fastest spacing between request starts to one host (seconds)
+MAX_DELAY = 30.0      # slowest spacing after repeated errors
+SLOW_LATENCY = 8.0    # a "successful" request slower than this still counts as the host struggling
+BASE_BACKOFF = 2.0    # first retry waits about this long, doubling each attempt
+MAX_BACKOFF = 120.0
+MAX_ATTEMPTS = 3      # tries per URL per stage before it is reported as failed
+
+
+def retry_after_seconds(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date); None if absent/invalid"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (now if now is not None else time.time()))
+
+
+def backoff_delay(attempt, retry_after=None, base=BASE_BACKOFF, cap=MAX_BACKOFF):
+    """Exponential backoff with full jitter around the nominal delay; never shorter than Retry-After"""
+    nominal = min(cap, base * 2 ** (attempt - 1))
+    delay = random.uniform(nominal / 2, nominal * 1.5)
+    return max(delay, retry_after or 0.0)
+
+
+class HostState:
+    def __init__(self, per_host, delay):
+        self.slots = asyncio.Semaphore(per_host)
+        self.delay = delay
+        self.next_start = 0.0
+        self.blocked_until = 0.0
+        self.latency = None   # EWMA of request latency
+        self.ok = 0
+        self.errors = 0
+
+
+class HostScheduler:
+    """Per-host concurrency cap plus adaptive spacing between request starts.
+
+    Spacing shrinks while a host answers quickly and successfully, and grows on
+    errors or slow answers (AIMD-style). A 429/503 with Retry-After pauses the
+    host for that long.
+    """
+
+    def __init__(self, per_host, start_delay, min_delay=MIN_DELAY, max_delay=MAX_DELAY):
+        self.per_host = per_host
+        self.start_delay = start_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.hosts = {}
+
+    def host(self, url):
+        name = urlparse(url).hostname or ""
+        if name not in self.hosts:
+            self.hosts[name] = HostState(self.per_host, self.start_delay)
+        return self.hosts[name]
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        """Hold one of the host's slots, starting no sooner than its current spacing allows"""
+        state = self.host(url)
+        async with state.slots:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            start = max(now, state.next_start, state.blocked_until)
+            state.next_start = start + state.delay
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield state
+
+    def report(self, url, ok, latency=None, retry_after=None):
+        """Feed one request's outcome back into the host's pacing.
+
+        `ok` is False only when the host failed (throttling, 5xx, connection errors,
+        timeouts); `latency` is how long it took to answer, e.g. time to first byte.
+        """
+        state = self.host(url)
+        if latency is not None:
+            state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+        if retry_after is not None:
+            state.blocked_until = asyncio.get_running_loop().time() + retry_after
+        if ok and (latency is None or latency < SLOW_LATENCY):
+            state.ok += 1
+            state.delay = max(self.min_delay, state.delay * 0.9)
+        else:
+            state.errors += not ok
+            state.delay = min(self.max_delay, max(state.delay * 2, 1.0))
+
+    def summary(self):
+        return {
+            host: {"ok": s.ok, "errors": s.errors, "delay_s": round(s.delay, 2),
+                   "latency_s": round(s.latency, 2) if s.latency is not None else None}
+            for host, s in self.hosts.items()
+        }
+
+
+class RetryTracker:
+    """Counts attempts per job and re-queues failed jobs after a backoff delay.
+
+    The re-queue keeps the original queue item unfinished until the retry is
+    back on the queue, so `queue.join()` only returns once retries are done too.
+    """
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self.attempts = {}
+        self.failures = {}
+        self._tasks = set()
+
+    def attempt(self, stage, key):
+        """Register one more attempt; returns the attempt number"""
+        n = self.attempts.get((stage, key), 0) + 1
+        self.attempts[(stage, key)] = n
+        return n
+
+    def can_retry(self, stage, key):
+        return self.attempts.get((stage, key), 0) < self.max_attempts
+
+    def retry_later(self, queue, job, stage, key, retry_after=None):
+        """Put `job` back on `queue` after a backoff; call instead of queue.task_done()"""
+        delay = backoff_delay(self.attempts.get((stage, key), 1), retry_after)
+
+        async def requeue():
+            try:
+                await asyncio.sleep(delay)
+                await queue.put(job)
+            finally:
+                queue.task_done()
+
+        task = asyncio.create_task(requeue())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return delay
+
+    def cancel_pending(self):
+        """Drop the retries still waiting out their backoff (each marks its queue item done)"""
+        for task in list(self._tasks):
+            task.cancel()
+
+    def fail(self, key, stage, error=None, status=None):
+        self.failures[key] = {"url": key, "stage": stage, "attempts": self.attempts.get((stage, key), 0),
+                              "error": str(error) if error else None, "status": status}
+
+    def succeed(self, key):
+        self.failures.pop(key, None)
@@ -1,29 +1,119 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+import asyncio
 import json
 import csv
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urljoin
 import time
+from export import PAPER_FIELDS, PaperWriter
+from catalog import Catalog
+
+try:
+    import lxml.html  # optional, much faster than html.parser
+    DEFAULT_PARSER = 'lxml-native'
+except ImportError:
+    lxml = None
+    DEFAULT_PARSER = 'html.parser'
+
+try:
+    import httpx  # optional, only needed for AsyncPastPapersWikiScraper
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (lets httpx speak HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Parser backends:
+#   'html.parser'  BeautifulSoup with the stdlib parser
+#   'lxml'         BeautifulSoup on top of lxml
+#   'lxml-native'  listing pages are read straight from an lxml tree (no soup at all);
+#                  everything else uses BeautifulSoup on top of lxml
+PARSERS = ('html.parser', 'lxml', 'lxml-native')
+
+# Listing pages only need the post cards and the pagination links
+LISTING_STRAINER = SoupStrainer(['article', 'a'])
+
+def _has_class(cls):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {cls} ")'
+
+XPATH_ARTICLES = f'//article[{_has_class("jeg_post")}]'
+XPATH_TITLE = f'.//h3[{_has_class("jeg_post_title")}]'
+XPATH_EXCERPT = f'.//div[{_has_class("jeg_post_excerpt")}]'
+XPATH_THUMB = f'.//div[{_has_class("jeg_thumb")}]'
+
+# BeautifulSoup's get_text() leaves out the contents of these
+NON_TEXT_TAGS = ('script', 'style', 'template')
+
+def _stripped_text(el):
+    """Same result as BeautifulSoup's get_text(strip=True) for an lxml element"""
+    parts = []
+
+    def add(text):
+        if text and text.strip():
+            parts.append(text.strip())
+
+    def walk(node):
+        add(node.text)
+        for child in node:
+            # comments and processing instructions have a non-string tag
+            if isinstance(child.tag, str) and child.tag not in NON_TEXT_TAGS:
+                walk(child)
+            add(child.tail)
+
+    walk(el)
+    return ''.join(parts)
 
 class PastPapersWikiScraper:
-    def __init__(self, base_url):
+    def __init__(self, base_url, max_workers=8, parser=DEFAULT_PARSER, strain_listings=True):
+        self._init_parser(parser, strain_listings)
         self.base_url = base_url
+        self.max_workers = max_workers
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        # one pooled connection per worker thread
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.papers = []
+        self.catalog = None   # set by save_to_catalog / open_catalog; indexed search is self.catalog.query()
+
+    def _init_parser(self, parser, strain_listings):
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown parser {parser!r}; expected one of {', '.join(PARSERS)}")
+        if parser != 'html.parser' and lxml is None:
+            raise ValueError(f"Parser {parser!r} needs lxml installed (pip install lxml)")
+        self.parser = parser
+        self.soup_parser = 'html.parser' if parser == 'html.parser' else 'lxml'
+        self.listing_filter = LISTING_STRAINER if strain_listings else None
     
-    def fetch_page(self, url):
-        """Fetch a webpage and return BeautifulSoup object"""
+    def parse(self, content, parse_only=None):
+        """Parse HTML with the configured backend, optionally keeping only what parse_only matches"""
+        return BeautifulSoup(content, self.soup_parser, parse_only=parse_only)
+
+    def fetch_content(self, url):
+        """Fetch a webpage and return its raw bytes"""
         try:
             print(f"Fetching: {url}")
             response = self.session.get(url, timeout=15)
             response.raise_for_status()
-            return BeautifulSoup(response.content, 'html.parser')
+            return response.content
         except requests.RequestException as e:
             print(f"Error fetching {url}: {e}")
             return None
+
+    def fetch_page(self, url, parse_only=None):
+        """Fetch a webpage and return BeautifulSoup object"""
+        content = self.fetch_content(url)
+        if content is None:
+            return None
+        return self.parse(content, parse_only)
     
     def extract_paper_links(self, soup):
         """Extract all past paper links from the page"""
@@ -69,17 +159,165 @@ class PastPapersWikiScraper:
                 continue
         
         return papers
-    
-    def scrape_all_papers(self):
-        """Scrape all papers from the main page"""
-        soup = self.fetch_page(self.base_url)
+
+    def extract_paper_links_lxml(self, doc):
+        """extract_paper_links for an lxml.html tree; returns exactly the same dicts"""
+        papers = []
+
+        for article in doc.xpath(XPATH_ARTICLES):
+            try:
+                title_tags = article.xpath(XPATH_TITLE)
+                if not title_tags:
+                    continue
+                link_tags = title_tags[0].xpath('.//a[@href]')
+                if not link_tags:
+                    continue
+
+                paper_info = {
+                    'title': _stripped_text(link_tags[0]),
+                    'url': link_tags[0].get('href')
+                }
+
+                excerpts = article.xpath(XPATH_EXCERPT)
+                if excerpts:
+                    desc_p = excerpts[0].xpath('.//p')
+                    if desc_p:
+                        paper_info['description'] = _stripped_text(desc_p[0])
+
+                thumbs = article.xpath(XPATH_THUMB)
+                if thumbs:
+                    img = thumbs[0].xpath('.//img')
+                    if img:
+                        paper_info['image'] = img[0].get('src') or img[0].get('data-src')
+
+                papers.append(paper_info)
+                print(f"Found: {paper_info['title']}")
+
+            except Exception as e:
+                print(f"Error extracting paper info: {e}")
+                continue
+
+        return papers
+
+    def extract_listing(self, content, category_url):
+        """Papers and last page number from a raw category listing page"""
+        if self.parser == 'lxml-native':
+            if not content.strip():
+                return [], 1
+            if isinstance(content, bytes):
+                # pick the encoding the way BeautifulSoup does; lxml alone reads a page without <meta charset> as Latin-1
+                content = UnicodeDammit(content, is_html=True).unicode_markup or content
+            try:
+                doc = lxml.html.fromstring(content)
+            except lxml.etree.ParserError:   # nothing but whitespace or comments
+                return [], 1
+            hrefs = (a.get('href') for a in doc.iter('a') if a.get('href') is not None)
+            return self.extract_paper_links_lxml(doc), self._last_page_from_hrefs(hrefs, category_url)
+        soup = self.parse(content, self.listing_filter)
+        return self.extract_paper_links(soup), self.extract_last_page(soup, category_url)
+
+    def fetch_listing(self, url, category_url):
+        """Fetch and parse a category listing page on the calling thread; None on failure"""
+        content = self.fetch_content(url)
+        if content is None:
+            return None
+        return self.extract_listing(content, category_url)
+
+    def extract_pdf_link(self, soup, page_url):
+        """Extract the direct PDF link from a single paper page (None if not in the static HTML)"""
+        # First try the known download button
+        link_tag = soup.select_one('a.wpfd_downloadlink[href$=".pdf"]')
+
+        # Fallback: any anchor that ends with .pdf
+        if not link_tag:
+            for a in soup.select('a[href*=".pdf"]'):
+                if a['href'].lower().endswith('.pdf'):
+                    link_tag = a
+                    break
+
+        if not link_tag:
+            return None
+        return urljoin(page_url, link_tag['href'])
+
+    def page_url(self, category_url, page):
+        """URL of a category listing page (page 1 is the category URL itself)"""
+        if page == 1:
+            return category_url
+        return urljoin(category_url.rstrip('/') + '/', f'page/{page}/')
+
+    def extract_last_page(self, soup, category_url):
+        """Highest page number linked from a category page's pagination (1 if none)"""
+        return self._last_page_from_hrefs((a['href'] for a in soup.find_all('a', href=True)), category_url)
+
+    def _last_page_from_hrefs(self, hrefs, category_url):
+        last = 1
+        prefix = category_url.rstrip('/') + '/page/'
+        for href in hrefs:
+            if 'page/' not in href:
+                continue
+            href = urljoin(category_url, href)
+            if href.startswith(prefix):
+                match = re.match(r'(\d+)', href[len(prefix):])
+                if match:
+                    last = max(last, int(match.group(1)))
+        return last
+
+    def iter_papers(self, category_urls=None):
+        """Yield papers from every page of every category as the pages arrive.
+
+        Listing pages are fetched concurrently (max_workers at a time) and papers
+        already seen, by URL, are skipped.
+        """
+        category_urls = category_urls or [self.base_url]
+        if isinstance(category_urls, str):
+            category_urls = [category_urls]
+
+        seen = set()
+        last_page = {c: 1 for c in category_urls}
+        requested = set()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {}
+
+            def submit_known_pages():
+                for category, last in last_page.items():
+                    for page in range(1, last + 1):
+                        if (category, page) not in requested:
+                            requested.add((category, page))
+                            future = pool.submit(self.fetch_listing, self.page_url(category, page), category)
+                            pending[future] = category
+
+            submit_known_pages()
+            try:
+                while pending:
+                    future = next(as_completed(pending))
+                    category = pending.pop(future)
+                    listing = future.result()
+                    if listing is None:
+                        continue
+                    papers, last = listing
+
+                    # pagination usually shows the last page; later pages may reveal more
+                    if last > last_page[category]:
+                        last_page[category] = last
+                        submit_known_pages()
+
+                    for paper in papers:
+                        if paper['url'] not in seen:
+                            seen.add(paper['url'])
+                            yield paper
+            finally:
+                # the caller stopped early: drop the queued pages, only those in flight finish
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def scrape_all_papers(self, category_urls=None):
+        """Scrape all papers from every page of the category (or categories)"""
+        self.papers = list(self.iter_papers(category_urls))
         
-        if not soup:
+        if not self.papers:
             print("Failed to fetch the page")
             return []
         
-        self.papers = self.extract_paper_links(soup)
-        
         print(f"\n=== Total papers found: {len(self.papers)} ===")
         return self.papers
     
@@ -95,14 +333,47 @@ class PastPapersWikiScraper:
             print("No papers to save")
             return
         
-        keys = self.papers[0].keys()
-        
+        # fixed columns: the first paper may lack description/image while later ones have them
         with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=keys)
+            writer = csv.DictWriter(f, fieldnames=PAPER_FIELDS, extrasaction='ignore')
             writer.writeheader()
             writer.writerows(self.papers)
         
         print(f"Data saved to {filename}")
+
+    def open_catalog(self, path='past_papers.sqlite3'):
+        """Attach a catalog (see catalog.Catalog) as self.catalog, for indexed searches across runs"""
+        self.catalog = Catalog(path)
+        return self.catalog
+
+    def save_to_catalog(self, path='past_papers.sqlite3'):
+        """Add scraped papers to a local SQLite catalog, kept across runs, and attach it"""
+        if self.catalog is None or self.catalog.path != path:
+            self.open_catalog(path)
+        written = self.catalog.add(self.papers)
+        print(f"Catalogued {written} new or changed papers in {path}")
+
+    def export_papers(self, paths, category_urls=None, mode='w', flush_every=100):
+        """Crawl the categories and write each paper to every export file as it arrives.
+
+        `paths` are .ndjson/.jsonl/.csv files (see export.PaperWriter for modes).
+        Papers aren't kept in memory. Returns the number of papers crawled.
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        writers = [PaperWriter(path, mode, flush_every=flush_every) for path in paths]
+        count = 0
+        try:
+            for paper in self.iter_papers(category_urls):
+                for writer in writers:
+                    writer.write(paper)
+                count += 1
+        finally:
+            for writer in writers:
+                writer.close()
+        for writer in writers:
+            print(f"Exported {writer.written} papers to {writer.path} ({writer.skipped} already there)")
+        return count
     
     def print_papers(self):
         """Print all papers in a formatted way"""
@@ -117,19 +388,187 @@ class PastPapersWikiScraper:
                 print(f"   Description: {paper['description']}")
             print("-" * 80)
     
+    def matches_year(self, paper, year):
+        """True if the paper's title mentions the year"""
+        return str(year) in paper['title']
+
+    def matches_type(self, paper, paper_type):
+        """True if the paper's title mentions the type (case-insensitive)"""
+        return paper_type.lower() in paper['title'].lower()
+
     def filter_by_year(self, year):
         """Filter papers by year"""
-        filtered = [p for p in self.papers if str(year) in p['title']]
+        filtered = [p for p in self.papers if self.matches_year(p, year)]
         print(f"\nFound {len(filtered)} papers for year {year}")
         return filtered
     
     def filter_by_type(self, paper_type):
         """Filter papers by type (e.g., 'Marking Scheme', 'Past Paper')"""
-        filtered = [p for p in self.papers if paper_type.lower() in p['title'].lower()]
+        filtered = [p for p in self.papers if self.matches_type(p, paper_type)]
         print(f"\nFound {len(filtered)} papers of type '{paper_type}'")
         return filtered
 
 
+class AsyncPastPapersWikiScraper(PastPapersWikiScraper):
+    """asyncio flavour of PastPapersWikiScraper on an httpx.AsyncClient.
+
+    Fetching methods are coroutines (iter_papers is an async generator); parsing,
+    extraction, filtering and saving are the same methods as the sync scraper.
+    Up to `max_concurrency` requests are in flight at once over keep-alive
+    connections, using HTTP/2 when the `h2` package is installed.
+
+        async with AsyncPastPapersWikiScraper(url) as scraper:
+            papers = await scraper.scrape_all_papers()
+        scraper.save_to_csv()
+    """
+
+    def __init__(self, base_url, max_concurrency=32, parser=DEFAULT_PARSER, strain_listings=True,
+                 http2=None, timeout=15):
+        if httpx is None:
+            raise ValueError("AsyncPastPapersWikiScraper needs httpx installed (pip install httpx)")
+        if http2 and not HTTP2_AVAILABLE:
+            raise ValueError("HTTP/2 needs the h2 package installed (pip install 'httpx[http2]')")
+        self._init_parser(parser, strain_listings)
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.http2 = HTTP2_AVAILABLE if http2 is None else http2
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            headers={'User-Agent': USER_AGENT},
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=timeout,
+            follow_redirects=True,
+        )
+        self.semaphore = asyncio.BoundedSemaphore(max_concurrency)
+        self.papers = []
+        self.catalog = None   # set by save_to_catalog / open_catalog; indexed search is self.catalog.query()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def fetch_content(self, url):
+        """Fetch a webpage and return its raw bytes"""
+        async with self.semaphore:
+            try:
+                print(f"Fetching: {url}")
+                response = await self.client.get(url)
+                response.raise_for_status()
+                return response.content
+            except httpx.HTTPError as e:
+                print(f"Error fetching {url}: {e}")
+                return None
+
+    async def fetch_page(self, url, parse_only=None):
+        """Fetch a webpage and return BeautifulSoup object"""
+        content = await self.fetch_content(url)
+        if content is None:
+            return None
+        return self.parse(content, parse_only)
+
+    async def fetch_listing(self, url, category_url):
+        """Fetch and parse a category listing page; None on failure"""
+        content = await self.fetch_content(url)
+        if content is None:
+            return None
+        return self.extract_listing(content, category_url)
+
+    async def fetch_pdf_link(self, page_url):
+        """Direct PDF link of a paper page (None if it isn't in the static HTML or the page failed)"""
+        soup = await self.fetch_page(page_url)
+        if soup is None:
+            return None
+        return self.extract_pdf_link(soup, page_url)
+
+    async def fetch_pdf_links(self, page_urls):
+        """{page_url: pdf link or None} for many paper pages, fetched concurrently"""
+        links = await asyncio.gather(*(self.fetch_pdf_link(url) for url in page_urls))
+        return dict(zip(page_urls, links))
+
+    async def iter_papers(self, category_urls=None):
+        """Yield papers from every page of every category as the pages arrive.
+
+        All known listing pages are requested at once (the semaphore caps how many
+        are in flight) and papers already seen, by URL, are skipped.
+        """
+        category_urls = category_urls or [self.base_url]
+        if isinstance(category_urls, str):
+            category_urls = [category_urls]
+
+        seen = set()
+        last_page = {c: 1 for c in category_urls}
+        requested = set()
+        pending = {}
+
+        def submit_known_pages():
+            for category, last in last_page.items():
+                for page in range(1, last + 1):
+                    if (category, page) not in requested:
+                        requested.add((category, page))
+                        task = asyncio.ensure_future(self.fetch_listing(self.page_url(category, page), category))
+                        pending[task] = category
+
+        submit_known_pages()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    category = pending.pop(task)
+                    listing = task.result()
+                    if listing is None:
+                        continue
+                    papers, last = listing
+
+                    # pagination usually shows the last page; later pages may reveal more
+                    if last > last_page[category]:
+                        last_page[category] = last
+                        submit_known_pages()
+
+                    for paper in papers:
+                        if paper['url'] not in seen:
+                            seen.add(paper['url'])
+                            yield paper
+        finally:
+            # the caller stopped early: don't leave requests running
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def scrape_all_papers(self, category_urls=None):
+        """Scrape all papers from every page of the category (or categories)"""
+        self.papers = [paper async for paper in self.iter_papers(category_urls)]
+
+        if not self.papers:
+            print("Failed to fetch the page")
+            return []
+
+        print(f"\n=== Total papers found: {len(self.papers)} ===")
+        return self.papers
+
+    async def export_papers(self, paths, category_urls=None, mode='w', flush_every=100):
+        """Crawl the categories and write each paper to every export file as it arrives"""
+        if isinstance(paths, str):
+            paths = [paths]
+        writers = [PaperWriter(path, mode, flush_every=flush_every) for path in paths]
+        count = 0
+        try:
+            async for paper in self.iter_papers(category_urls):
+                for writer in writers:
+                    writer.write(paper)
+                count += 1
+        finally:
+            for writer in writers:
+                writer.close()
+        for writer in writers:
+            print(f"Exported {writer.written} papers to {writer.path} ({writer.skipped} already there)")
+        return count
+
+
 # Example usage
 if __name__ == "__main__":
     # URL for General English Past Papers Wiki
@@ -138,7 +577,7 @@ if __name__ == "__main__":
     # Create scraper instance
     scraper = PastPapersWikiScraper(url)
     
-    # Scrape all papers
+    # Scrape all papers (every page of the category; pass a list to crawl several categories at once)
     papers = scraper.scrape_all_papers()
     
     # Print all papers
@@ -147,6 +586,7 @@ if __name__ == "__main__":
     # Save to files
     scraper.save_to_json('general_english_papers.json')
     scraper.save_to_csv('general_english_papers.csv')
+    scraper.save_to_catalog('past_papers.sqlite3')   # searchable later with scraper.catalog.query(...)
     
     # Example: Filter by year
     print("\n" + "="*80)
@@ -0,0 +1,183 @@
+import contextlib
+import json
+import math
+import threading
+import time
+
+
+def percentile(values, p):
+    """p-th percentile (0-100) of `values` with linear interpolation; None if empty"""
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+class UrlTimer:
+    """Stage timings, byte counts and strategy outcomes for one attempt at one URL.
+
+    Stages are named blocks of wall time ("navigate", "direct", "disk_write", ...);
+    a stage entered twice accumulates. Strategies are the download approaches
+    tried, in order, each with its outcome, so the record shows which fallback
+    finally worked.
+    """
+
+    def __init__(self, i, url, stage, attempt=1):
+        self.i = i
+        self.url = url
+        self.stage = stage
+        self.attempt = attempt
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.stages = {}
+        self.bytes = {}
+        self.strategies = []
+        self.responses = []   # time to first byte of each HTTP response (host pacing)
+
+    def add(self, name, seconds, nbytes=None):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        if nbytes:
+            self.bytes[name] = self.bytes.get(name, 0) + nbytes
+
+    def response(self, seconds):
+        """Note one HTTP response's time to first byte"""
+        self.responses.append(seconds)
+
+    def latency(self):
+        """The slowest response time to first byte in this attempt; None if nothing answered"""
+        return max(self.responses) if self.responses else None
+
+    @contextlib.contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def strategy(self, name):
+        """Time one download strategy; set ok/bytes on the yielded dict to record the outcome"""
+        outcome = {"strategy": name, "ok": False, "bytes": None}
+        start = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            outcome["s"] = time.perf_counter() - start
+            self.add(name, outcome["s"], outcome["bytes"])
+            self.strategies.append(outcome)
+
+    def record(self, result=None, error=None, next_step=None):
+        """The JSON-ready line for this attempt; next_step is "retry" or "browser" if the URL isn't finished"""
+        return {
+            "i": self.i, "url": self.url, "stage": self.stage, "attempt": self.attempt,
+            "started": round(self.started, 3),
+            "total_s": round(time.perf_counter() - self._t0, 4),
+            "saved": bool(result and result["saved"]),
+            "strategy": result["strategy"] if result else None,
+            "stages": {k: round(v, 4) for k, v in self.stages.items()},
+            "bytes": self.bytes,
+            "strategies": [dict(o, s=round(o["s"], 4)) for o in self.strategies],
+            "error": str(error) if error else None,
+            "next": next_step,
+        }
+
+
+class TimingLog:
+    """Appends one JSON line per URL attempt and keeps this run's lines for the summary"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.records = []
+        self._lock = threading.Lock()
+        self._fh = open(path, "a", encoding="utf-8") if path else None
+        self.run_id = time.strftime("%Y%m%dT%H%M%S")
+        self._t0 = time.perf_counter()
+
+    def write(self, timer, result=None, error=None, next_step=None):
+        line = timer.record(result, error, next_step)
+        line["run"] = self.run_id
+        with self._lock:
+            self.records.append(line)
+            if self._fh:
+                self._fh.write(json.dumps(line) + "\n")
+                self._fh.flush()
+        return line
+
+    def elapsed(self):
+        return time.perf_counter() - self._t0
+
+    def close(self):
+        with self._lock:
+            if self._fh:
+                self._fh.close()
+                self._fh = None
+
+
+def summarize(records, wall_s=None):
+    """p50/p95 per stage, success rate and throughput per strategy, over timing records"""
+    stages = {}
+    strategies = {}
+    for rec in records:
+        for name, s in rec["stages"].items():
+            stages.setdefault(name, []).append(s)
+        for o in rec["strategies"]:
+            st = strategies.setdefault(o["strategy"], {"tried": 0, "ok": 0, "bytes": 0, "ok_s": 0.0})
+            st["tried"] += 1
+            if o["ok"]:
+                st["ok"] += 1
+                st["bytes"] += o["bytes"] or 0
+                st["ok_s"] += o["s"]
+
+    final = {}
+    for rec in records:
+        if rec["saved"]:
+            final[rec["url"]] = rec["strategy"]
+    total_bytes = sum(sum(rec["bytes"].values()) for rec in records)
+    urls = {rec["url"] for rec in records}
+    return {
+        "urls": len(urls),
+        "saved": len(final),
+        "attempts": len(records),
+        "wall_s": wall_s,
+        "bytes": total_bytes,
+        "bytes_per_s": total_bytes / wall_s if wall_s else None,
+        "won_by": {name: list(final.values()).count(name) for name in set(final.values())},
+        "stages": {
+            name: {"n": len(v), "p50": percentile(v, 50), "p95": percentile(v, 95), "total": sum(v)}
+            for name, v in stages.items()
+        },
+        "strategies": {
+            name: dict(st, rate=st["ok"] / st["tried"], bytes_per_s=st["bytes"] / st["ok_s"] if st["ok_s"] else None)
+            for name, st in strategies.items()
+        },
+    }
+
+
+def human_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def print_summary(summary):
+    print(f"\n→ Run report: {summary['saved']}/{summary['urls']} URLs saved in {summary['attempts']} attempts", end="")
+    if summary["wall_s"]:
+        print(f", {summary['wall_s']:.1f}s wall, {human_bytes(summary['bytes'])} "
+              f"at {human_bytes(summary['bytes_per_s'])}/s", end="")
+    print()
+    if summary["stages"]:
+        print(f"   {'stage':<16}{'n':>5}{'p50':>9}{'p95':>9}{'total':>9}")
+        for name, st in sorted(summary["stages"].items(), key=lambda kv: -kv[1]["total"]):
+            print(f"   {name:<16}{st['n']:>5}{st['p50']:>8.2f}s{st['p95']:>8.2f}s{st['total']:>8.1f}s")
+    if summary["strategies"]:
+        print(f"   {'strategy':<16}{'tried':>6}{'ok':>5}{'rate':>7}  throughput")
+        for name, st in sorted(summary["strategies"].items(), key=lambda kv: -kv[1]["tried"]):
+            speed = f"{human_bytes(st['bytes_per_s'])}/s" if st["bytes_per_s"] else "-"
+            print(f"   {name:<16}{st['tried']:>6}{st['ok']:>5}{st['rate']:>7.0%}  {speed}")
+    if summary["won_by"]:
+        won = ", ".join(f"{name} {n}" for name, n in sorted(summary["won_by"].items(), key=lambda kv: -kv[1]))
+        print(f"   saved by: {won}")